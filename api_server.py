@@ -1,30 +1,149 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, Response
 from pydantic import BaseModel
-import sqlite3
+from typing import List
+from contextlib import asynccontextmanager
+import asyncio
 import datetime
+import hmac
 import os
-import json
-
-app = FastAPI()
+import threading
+import time
+from click_store import (ClickRetention, ClickWriter, RecentClicks, connect, init_click_db, rebuild_counters,
+                         reset_clicks, top_uids, uid_counts, vid_counts)
+from video_catalog import VideoCatalog
+from rate_limit import KeyedRateLimiter
+from metrics import Counter, Gauge, Histogram, render as render_metrics
 
 # 로컬 경로로 변경 (Starter 플랜에서는 'mnt/data'로 해야 함)
-DATA_DIR = "mnt/data"
+DATA_DIR = os.getenv("DATA_DIR", "mnt/data")
 DATA_PATH = os.path.join(DATA_DIR, "video_data.json")
 DB_PATH = os.path.join(DATA_DIR, "clicks.db")
 
+# 클릭 커밋 방식: batch(묶음 커밋) | durable(클릭마다 커밋). 다른 값이면 시작할 때 ValueError
+CLICK_COMMIT_MODE = os.getenv("CLICK_COMMIT_MODE", "batch")
+CLICK_BATCH_SIZE = int(os.getenv("CLICK_BATCH_SIZE", "256"))
+CLICK_BATCH_MS = float(os.getenv("CLICK_BATCH_MS", "5"))
+# 메모리 중복 필터에 보관할 최대 키 수 (0 이면 사용 안 함)
+CLICK_DEDUP_SIZE = int(os.getenv("CLICK_DEDUP_SIZE", "100000"))
+# 원본 클릭 보관 일수 (지나면 날짜별 집계로 합침, 0 이면 계속 보관)
+CLICK_RETENTION_DAYS = int(os.getenv("CLICK_RETENTION_DAYS", "30"))
+
+# /track 요청 제한 (초당 허용 수, 순간 허용량). 초당 허용 수가 0 이면 사용 안 함
+RATE_LIMIT_IP_PER_SEC = float(os.getenv("RATE_LIMIT_IP_PER_SEC", "20"))
+RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "100"))
+RATE_LIMIT_LINK_PER_SEC = float(os.getenv("RATE_LIMIT_LINK_PER_SEC", "2"))
+RATE_LIMIT_LINK_BURST = float(os.getenv("RATE_LIMIT_LINK_BURST", "30"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# 앞단 프록시 수: X-Forwarded-For 의 오른쪽에서 이만큼째 주소를 방문자 IP 로 씀 (Render 는 1, 프록시 없이 직접 받으면 0)
+# 0 이면 연결한 주소를 그대로 씀. 프록시 뒤에서 0 이면 모든 방문자가 프록시 IP 하나로 묶여 제한/중복 판정이 틀어짐
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+# 제한에 걸린 요청 처리: redirect(기록 없이 리다이렉트) | 429
+RATE_LIMIT_MODE = os.getenv("RATE_LIMIT_MODE", "redirect")
+
+# /api/stats 한 번에 조회할 수 있는 최대 uid/영상 수와 top 인원
+STATS_MAX_KEYS = int(os.getenv("STATS_MAX_KEYS", "5000"))
+STATS_MAX_TOP = int(os.getenv("STATS_MAX_TOP", "500"))
+# /api/admin/* 인증 키 (X-Admin-Key 헤더, 비어 있으면 관리 API 사용 안 함)
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")
+
+# webhook 이면 봇들을 이 프로세스에서 띄우고 /telegram/{봇}/{비밀값} 으로 업데이트를 받음
+BOT_RUNTIME = os.getenv("BOT_RUNTIME", "process")
+
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# ---------- 데이터 처리 ----------
-def load_data():
-    if not os.path.exists(DATA_PATH):
-        return {"videos": {}}
-    with open(DATA_PATH, "r") as f:
-        return json.load(f)
+# ---------- 지표 ----------
+REQUEST_LATENCY = Histogram("api_request_duration_seconds", "HTTP 요청 처리 시간", ["route", "method"])
+REQUESTS_IN_FLIGHT = Gauge("api_requests_in_flight", "처리 중인 HTTP 요청 수")
+CLICKS = Counter("api_clicks_total", "/track 클릭 처리 결과", ["status"])
+DB_COMMIT_LATENCY = Histogram("api_click_commit_duration_seconds", "클릭 묶음 커밋 시간")
+DB_COMMIT_ROWS = Counter("api_click_commit_rows_total", "커밋된 클릭 행 수 (중복 포함)")
+VIDEO_CACHE = Counter("api_video_cache_total", "영상 캐시 조회 결과", ["result"])
+RATE_LIMITED = Counter("api_rate_limited_total", "요청 제한에 걸린 /track 요청 수", ["scope"])
+RATE_LIMIT_KEYS = Gauge("api_rate_limit_keys", "요청 제한기가 추적 중인 키 수", ["scope"])
+RATE_LIMIT_EVICTED = Gauge("api_rate_limit_evicted", "요청 제한기에서 정리된 누적 키 수", ["scope"])
+WEBHOOK_UPDATES = Counter("api_webhook_updates_total", "웹훅으로 받은 텔레그램 업데이트", ["bot", "status"])
+
+def observe_commit(seconds, rows):
+    DB_COMMIT_LATENCY.observe(seconds)
+    DB_COMMIT_ROWS.inc(rows)
+
+class MetricsMiddleware:
+    # 순수 ASGI 미들웨어: 라우트 템플릿별 처리 시간과 동시 처리 수를 기록
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                route=getattr(route, "path", "unmatched"),
+                method=scope["method"]
+            )
+
+video_catalog = VideoCatalog(DATA_PATH)
+click_writer = ClickWriter(
+    DB_PATH, mode=CLICK_COMMIT_MODE, batch_size=CLICK_BATCH_SIZE, batch_ms=CLICK_BATCH_MS,
+    on_commit=observe_commit,
+    maintenance=ClickRetention(CLICK_RETENTION_DAYS) if CLICK_RETENTION_DAYS > 0 else None
+)
+recent_clicks = RecentClicks(CLICK_DEDUP_SIZE)
+rate_limiters = {}
+if RATE_LIMIT_IP_PER_SEC > 0:
+    rate_limiters["ip"] = KeyedRateLimiter(RATE_LIMIT_IP_PER_SEC, RATE_LIMIT_IP_BURST, RATE_LIMIT_MAX_KEYS)
+if RATE_LIMIT_LINK_PER_SEC > 0:
+    rate_limiters["link"] = KeyedRateLimiter(RATE_LIMIT_LINK_PER_SEC, RATE_LIMIT_LINK_BURST, RATE_LIMIT_MAX_KEYS)
 
-def save_data(data):
-    with open(DATA_PATH, "w") as f:
-        json.dump(data, f)
+def admit_click(ip, vid, uid):
+    # 허용되면 None, 아니면 걸린 제한 종류("ip" / "link")
+    keys = {"ip": ip, "link": (vid, uid)}
+    for scope, limiter in rate_limiters.items():
+        if not limiter.allow(keys[scope]):
+            RATE_LIMITED.inc(scope=scope)
+            return scope
+    return None
+
+def client_ip(request):
+    # 프록시가 덧붙인 오른쪽 항목만 믿음 (왼쪽은 방문자가 마음대로 넣을 수 있음)
+    if TRUSTED_PROXY_HOPS > 0:
+        forwarded = [p.strip() for p in request.headers.get("x-forwarded-for", "").split(",") if p.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else ""
+
+def today_utc():
+    return datetime.datetime.utcnow().date().isoformat()
+
+@asynccontextmanager
+async def lifespan(app):
+    video_catalog.load()
+    conn = connect(DB_PATH)
+    recent_clicks.load_day(conn, today_utc())
+    conn.close()
+    click_writer.start()
+    bots_stop = asyncio.Event()
+    bots_task = None
+    if BOT_RUNTIME == "webhook":
+        import runtime
+        bots_task = asyncio.create_task(runtime.run_all(runtime.BOT_MODULES, webhook=True, stop=bots_stop))
+    yield
+    if bots_task is not None:
+        bots_stop.set()
+        await bots_task
+    # 종료 시 큐에 남은 클릭을 모두 커밋한 뒤 연결을 닫음
+    await asyncio.to_thread(click_writer.stop)
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 # ---------- DB 초기화 ----------
 def init_db():
@@ -35,39 +154,41 @@ def init_db():
         print(f"❌ [init_db 오류] DB 파일 생성 실패: {e}")
         raise SystemExit("⛔ DB 파일 생성 실패. 경로를 확인하세요.")
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS clicks (
-            vid TEXT,
-            uid TEXT,
-            ip TEXT,
-            date TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(vid, uid, ip, date)
-        )
-    ''')
-    conn.commit()
+    conn = connect(DB_PATH)
+    init_click_db(conn)
     conn.close()
 
 # ---------- 공유 링크 클릭 ----------
 @app.get("/track")
 async def track(vid: str, uid: str, request: Request):
-    ip = request.client.host
-    today = datetime.datetime.utcnow().date().isoformat()
+    ip = client_ip(request)
+    today = today_utc()
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    try:
-        c.execute("INSERT INTO clicks (vid, uid, ip, date) VALUES (?, ?, ?, ?)", (vid, uid, ip, today))
-        conn.commit()
-        status = "counted"
-    except sqlite3.IntegrityError:
+    # 과도한 요청은 DB 를 거치지 않고 바로 응답
+    if admit_click(ip, vid, uid) is not None:
+        CLICKS.inc(status="limited")
+        if RATE_LIMIT_MODE == "429":
+            return JSONResponse(
+                status_code=429, headers={"Retry-After": "1"},
+                content={"status": "limited", "message": "요청이 너무 많습니다."}
+            )
+        video_url = (video_catalog.get(vid) or {}).get("video_url")
+        if video_url:
+            return RedirectResponse(video_url)
+        return JSONResponse(content={"status": "limited", "message": "영상 링크가 없습니다."})
+
+    # 이미 본 클릭은 DB 를 거치지 않고 바로 중복 처리
+    if recent_clicks.seen(vid, uid, ip, today):
         status = "duplicate"
-    conn.close()
+    else:
+        # 최종 중복 여부는 UNIQUE(vid, uid, ip, date) 제약으로 판단 (기록기 스레드에서 커밋)
+        status = await click_writer.submit(asyncio.get_running_loop(), vid, uid, ip, today)
+        recent_clicks.add(vid, uid, ip, today)
+    CLICKS.inc(status=status)
 
-    data = load_data()
-    video_url = data.get("videos", {}).get(vid, {}).get("video_url")
+    video = video_catalog.get(vid)
+    VIDEO_CACHE.inc(result="hit" if video is not None else "miss")
+    video_url = (video or {}).get("video_url")
     if video_url:
         return RedirectResponse(video_url)
 
@@ -82,16 +203,128 @@ class VideoData(BaseModel):
 
 @app.post("/api/sync_video")
 async def sync_video(data: VideoData):
-    all_data = load_data()
-    all_data.setdefault("videos", {})[data.video_id] = {
+    video_catalog.upsert(data.video_id, {
         "title": data.title,
         "video_url": data.video_url,
         "thumbnail": data.thumbnail,
         "count": 0
-    }
-    save_data(all_data)
+    })
     return {"status": "ok", "message": f"영상 {data.video_id} 동기화 완료"}
 
+# ---------- 일괄/증분 동기화 ----------
+class VideoBatch(BaseModel):
+    upserts: List[VideoData] = []
+    deletes: List[str] = []
+
+def catalog_etag(version):
+    return f'"{version}"'
+
+@app.post("/api/sync_videos")
+async def sync_videos(batch: VideoBatch, response: Response):
+    upserts = {
+        v.video_id: {"title": v.title, "video_url": v.video_url, "thumbnail": v.thumbnail, "count": 0}
+        for v in batch.upserts
+    }
+    version = video_catalog.apply(upserts, batch.deletes)
+    response.headers["ETag"] = catalog_etag(version)
+    return {"status": "ok", "version": version, "upserted": len(upserts), "deleted": len(batch.deletes)}
+
+@app.get("/api/videos/changes")
+async def video_changes(request: Request, since: int = 0):
+    etag = catalog_etag(video_catalog.version)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    changes = video_catalog.changes_since(since)
+    return JSONResponse(content=changes, headers={"ETag": catalog_etag(changes["version"])})
+
+# ---------- 클릭 통계 조회 ----------
+class StatsQuery(BaseModel):
+    uids: List[str] = []
+    vids: List[str] = []
+    top: int = 0
+
+stats_conn = None
+stats_lock = threading.Lock()
+
+def query_stats(query):
+    # 읽기 전용 연결 하나를 스레드에서 씀 (WAL 이라 커밋 중인 쓰기를 막지 않음)
+    global stats_conn
+    with stats_lock:
+        if stats_conn is None:
+            stats_conn = connect(DB_PATH)
+        counts = uid_counts(stats_conn, query.uids)
+        video_counts = vid_counts(stats_conn, query.vids)
+        return {
+            "uids": {uid: counts.get(uid, 0) for uid in query.uids},
+            "vids": {vid: video_counts.get(vid, 0) for vid in query.vids},
+            "top": top_uids(stats_conn, query.top) if query.top > 0 else [],
+        }
+
+@app.post("/api/stats")
+async def stats(query: StatsQuery):
+    if len(query.uids) + len(query.vids) > STATS_MAX_KEYS or query.top > STATS_MAX_TOP:
+        return JSONResponse(status_code=413, content={"status": "error", "message": "조회 범위가 너무 큽니다."})
+    return await asyncio.to_thread(query_stats, query)
+
+# ---------- 관리 ----------
+def is_admin_request(request):
+    key = request.headers.get("x-admin-key", "")
+    return bool(ADMIN_API_KEY) and hmac.compare_digest(key.encode(), ADMIN_API_KEY.encode())
+
+async def run_admin_task(request, fn):
+    if not is_admin_request(request):
+        return JSONResponse(status_code=403, content={"status": "error", "message": "관리자 키가 필요합니다."})
+    # 기록기 스레드에서 앞선 클릭이 커밋된 뒤 실행되므로 쓰기끼리 부딪히지 않음
+    await click_writer.call(asyncio.get_running_loop(), fn)
+    return {"status": "ok"}
+
+@app.post("/api/admin/reset_clicks")
+async def admin_reset_clicks(request: Request):
+    result = await run_admin_task(request, reset_clicks)
+    if not isinstance(result, JSONResponse):
+        recent_clicks.clear()  # 지운 클릭이 중복으로 걸러지지 않도록
+    return result
+
+@app.post("/api/admin/rebuild_stats")
+async def admin_rebuild_stats(request: Request):
+    return await run_admin_task(request, rebuild_counters)
+
+# ---------- 텔레그램 웹훅 ----------
+@app.post("/telegram/{bot}/{path_secret}")
+async def telegram_webhook(bot: str, path_secret: str, request: Request):
+    import runtime
+    from telegram import Update
+    route = runtime.webhook_routes.get(bot)
+    # 경로/헤더에 ASCII 가 아닌 값이 와도 예외 없이 비교되도록 bytes 로 비교
+    if route is None or not hmac.compare_digest(path_secret.encode(), route[0].encode()):
+        WEBHOOK_UPDATES.inc(bot="unknown", status="not_found")
+        return Response(status_code=404)
+    header = request.headers.get("x-telegram-bot-api-secret-token", "")
+    if not hmac.compare_digest(header.encode(), route[1].encode()):
+        WEBHOOK_UPDATES.inc(bot=bot, status="forbidden")
+        return Response(status_code=403)
+    tg_app = runtime.running_apps.get(bot)
+    if tg_app is None:
+        # 재시작 중이면 텔레그램이 나중에 다시 보내도록 503
+        WEBHOOK_UPDATES.inc(bot=bot, status="unavailable")
+        return Response(status_code=503)
+    try:
+        update = Update.de_json(await request.json(), tg_app.bot)
+    except Exception:
+        WEBHOOK_UPDATES.inc(bot=bot, status="bad_request")
+        return Response(status_code=400)
+    await tg_app.update_queue.put(update)
+    WEBHOOK_UPDATES.inc(bot=bot, status="queued")
+    return Response(status_code=200)
+
+# ---------- 모니터링 ----------
+@app.get("/metrics")
+async def metrics():
+    for scope, limiter in rate_limiters.items():
+        RATE_LIMIT_KEYS.set(len(limiter), scope=scope)
+        RATE_LIMIT_EVICTED.set(limiter.evicted, scope=scope)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # ---------- 시작 ----------
 init_db()
 
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import platform
+
+# ---------- /track, /api/sync_video 부하 측정 ----------
+# api_server 의 FastAPI app 을 ASGI transport 로 같은 프로세스 안에서 호출한다 (네트워크 불필요).
+# 예) python bench_api.py --requests 20000 --concurrency 64 --out bench_api.json --baseline old.json
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="api_server 부하 측정")
+    parser.add_argument("--requests", type=int, default=10000, help="시나리오별 요청 수")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--videos", type=int, default=10000, help="카탈로그 영상 수")
+    parser.add_argument("--users", type=int, default=100000, help="서로 다른 uid 수")
+    parser.add_argument("--commit-mode", choices=["batch", "durable"], default="batch")
+    parser.add_argument("--scenarios", default="track_duplicates,track_distinct,track_catalog,sync_video,sync_videos")
+    parser.add_argument("--rate-limit", action="store_true", help="요청 제한기를 켠 채로 측정 (기본은 끔)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_api.json")
+    parser.add_argument("--baseline", help="비교할 이전 결과 파일")
+    return parser.parse_args()
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+def summarize(latencies, elapsed, statuses):
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 4),
+        "ops_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        "statuses": statuses,
+    }
+
+async def run_load(client, requests, concurrency):
+    # requests: (method, url, kwargs) 목록을 concurrency 개 작업자가 나눠서 처리
+    latencies = []
+    statuses = {}
+    it = iter(requests)
+
+    async def worker():
+        for method, url, kwargs in it:
+            started = time.perf_counter()
+            resp = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            key = str(resp.status_code)
+            statuses[key] = statuses.get(key, 0) + 1
+            # 캐시로 바로 끝나는 요청만 도는 작업자가 루프를 독점하지 않도록 양보
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, time.perf_counter() - started, statuses)
+
+# ---------- 시나리오 ----------
+def track_duplicates(args, rng):
+    # 대부분 같은 사람이 같은 링크를 새로고침 (uid 20명, 영상 5개)
+    return [("GET", "/track", {"params": {"vid": f"dup{rng.randrange(5)}", "uid": str(rng.randrange(20))}})
+            for _ in range(args.requests)]
+
+def track_distinct(args, rng):
+    # 서로 다른 uid 가 대부분이라 거의 모두 새 클릭
+    return [("GET", "/track", {"params": {"vid": f"dist{rng.randrange(50)}", "uid": str(rng.randrange(args.users))}})
+            for _ in range(args.requests)]
+
+def track_catalog(args, rng):
+    # 큰 카탈로그에 등록된 영상으로 리다이렉트
+    return [("GET", "/track", {"params": {"vid": f"video{rng.randrange(args.videos)}", "uid": str(rng.randrange(args.users))}})
+            for _ in range(args.requests)]
+
+def video_body(i):
+    return {"video_id": f"sync{i}", "title": f"title {i}", "video_url": f"https://example.com/v/{i}", "thumbnail": ""}
+
+def sync_video(args, rng):
+    n = max(1, args.requests // 10)
+    return [("POST", "/api/sync_video", {"json": video_body(rng.randrange(args.videos))}) for _ in range(n)]
+
+def sync_videos(args, rng):
+    n = max(1, args.requests // 100)
+    return [("POST", "/api/sync_videos", {"json": {
+        "upserts": [video_body(rng.randrange(args.videos)) for _ in range(100)],
+        "deletes": [f"sync{rng.randrange(args.videos)}" for _ in range(10)],
+    }}) for _ in range(n)]
+
+SCENARIOS = {
+    "track_duplicates": track_duplicates,
+    "track_distinct": track_distinct,
+    "track_catalog": track_catalog,
+    "sync_video": sync_video,
+    "sync_videos": sync_videos,
+}
+
+def seed_catalog(data_dir, count):
+    videos = {
+        f"video{i}": {"title": f"video {i}", "video_url": f"https://example.com/v/{i}", "thumbnail": "", "count": 0}
+        for i in range(count)
+    }
+    with open(os.path.join(data_dir, "video_data.json"), "w") as f:
+        json.dump({"videos": videos}, f)
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)["results"]
+    for name, res in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        ops = (res["ops_per_s"] / old["ops_per_s"] - 1) * 100 if old["ops_per_s"] else 0.0
+        p99 = (res["p99_ms"] / old["p99_ms"] - 1) * 100 if old["p99_ms"] else 0.0
+        print(f"  {name:18s} ops/s {ops:+7.1f}%   p99 {p99:+7.1f}%")
+
+async def main():
+    args = parse_args()
+    data_dir = tempfile.mkdtemp(prefix="bench_api_")
+    # api_server 는 import 시점에 경로/설정을 읽으므로 먼저 환경변수를 지정
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["CLICK_COMMIT_MODE"] = args.commit_mode
+    if not args.rate_limit:
+        # 모든 요청이 같은 클라이언트 IP 로 들어오므로 기본은 제한 없이 측정
+        os.environ["RATE_LIMIT_IP_PER_SEC"] = "0"
+        os.environ["RATE_LIMIT_LINK_PER_SEC"] = "0"
+    seed_catalog(data_dir, args.videos)
+
+    import httpx
+    import api_server
+
+    rng = random.Random(args.seed)
+    results = {}
+    async with api_server.lifespan(api_server.app):
+        transport = httpx.ASGITransport(app=api_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # 첫 요청의 초기화 비용이 결과에 섞이지 않도록 예열
+            await run_load(client, [("GET", "/track", {"params": {"vid": "warmup", "uid": str(i)}}) for i in range(200)],
+                           args.concurrency)
+            for name in args.scenarios.split(","):
+                requests = SCENARIOS[name](args, rng)
+                results[name] = await run_load(client, requests, args.concurrency)
+                r = results[name]
+                print(f"{name:18s} {r['ops_per_s']:>10.1f} ops/s  p50 {r['p50_ms']:.2f}ms  p99 {r['p99_ms']:.2f}ms")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"📝 결과 저장: {args.out}")
+    if args.baseline:
+        print(f"📊 {args.baseline} 대비:")
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,400 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import platform
+import datetime
+from bench_api import summarize, compare
+
+# ---------- 봇 핸들러 부하 측정 ----------
+# 텔레그램 없이 가짜 Update/context 와 기록만 하는 봇 객체로 핸들러 함수를 직접 호출한다.
+# 추천인/클릭/선착순 데이터를 미리 대량으로 채운 뒤 핸들러별 처리량과 지연(p50/p90/p99)을 잰다.
+# 시나리오마다 봇이 보낸 답장을 기록해 두고 기대한 답장이 나왔는지 확인한다 (틀리면 AssertionError 로 중단).
+# 예) python bench_handlers.py --referrers 100000 --clicks 2000000 --rush-limit 10000 --out bench_handlers.json --baseline old.json
+#     python bench_handlers.py --quick   (작은 데이터로 빠르게 동작만 확인)
+
+# --quick 일 때 따로 지정하지 않은 값에 쓰는 작은 크기
+QUICK = {
+    "requests": 500, "referrers": 5000, "clicks": 50000, "click_users": 5000,
+    "videos": 100, "rush_limit": 500, "rush_messages": 2500,
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="봇 핸들러 부하 측정")
+    parser.add_argument("--requests", type=int, default=5000, help="시나리오별 호출 수")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--referrers", type=int, default=100000, help="추천 코드를 가진 사용자 수")
+    parser.add_argument("--clicks", type=int, default=1000000, help="미리 넣어 둘 클릭 수")
+    parser.add_argument("--click-users", type=int, default=50000, help="클릭을 받은 서로 다른 uid 수")
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--rush-limit", type=int, default=10000, help="선착순 인원")
+    parser.add_argument("--rush-messages", type=int, default=30000, help="선착순 시나리오에서 보낼 메시지 수")
+    parser.add_argument("--scenarios", default="start1,start1_referral,code1,code1_new,rank1,mystats,show_rank,emoji_rush")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_handlers.json")
+    parser.add_argument("--baseline", help="비교할 이전 결과 파일")
+    parser.add_argument("--quick", action="store_true", help="작은 데이터로 빠르게 실행")
+    args = parser.parse_args()
+    if args.quick:
+        for name, value in QUICK.items():
+            if getattr(args, name) == parser.get_default(name):
+                setattr(args, name, value)
+    return args
+
+# ---------- 가짜 텔레그램 객체 ----------
+class StubBot:
+    """보낸 메시지를 세고 (메서드, chat_id, 본문, 나머지 인자) 로 기록하는 봇 (send_message/edit_message_text/delete_message)."""
+
+    username = "bench_bot"
+
+    def __init__(self):
+        self.calls = {}
+        self.sent = []
+        self._next_id = 0
+
+    def _record(self, method, chat_id=None, text=None, **kwargs):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        self.sent.append((method, chat_id, text, kwargs))
+
+    def reset(self):
+        self.calls = {}
+        self.sent = []
+
+    def texts(self, method, chat_id=None):
+        return [text for m, c, text, _ in self.sent if m == method and (chat_id is None or c == chat_id)]
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self._record("send_message", chat_id, text, **kwargs)
+        self._next_id += 1
+        return FakeMessage(self, FakeChat(chat_id), text, message_id=self._next_id)
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        self._record("edit_message_text", chat_id, text, message_id=message_id, **kwargs)
+        return True
+
+    async def delete_message(self, chat_id, message_id, **kwargs):
+        self._record("delete_message", chat_id, message_id=message_id)
+        return True
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.full_name = f"user{user_id}"
+        self.first_name = self.full_name
+        self.username = None
+
+class FakeChat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+        self.type = "private" if chat_id > 0 else "supergroup"
+
+class FakeMessage:
+    def __init__(self, bot, chat, text, message_id=1):
+        self.bot = bot
+        self.chat = chat
+        self.text = text
+        self.message_id = message_id
+
+    async def reply_text(self, text, **kwargs):
+        self.bot._record("reply_text", self.chat.id, text, **kwargs)
+        return await self.bot.send_message(self.chat.id, text, **kwargs)
+
+class FakeUpdate:
+    def __init__(self, bot, user_id, chat_id=None, text=""):
+        self.effective_user = FakeUser(user_id)
+        self.effective_chat = FakeChat(user_id if chat_id is None else chat_id)
+        self.message = FakeMessage(bot, self.effective_chat, text)
+        self.effective_message = self.message
+        self.callback_query = None
+
+class FakeContext:
+    def __init__(self, bot, args=None):
+        self.bot = bot
+        self.args = args or []
+
+# ---------- 데이터 채우기 ----------
+def seed_referrals(bot1, count, rng):
+    # 코드는 봇과 같은 encode(순번) 으로 만들고, 추천 수는 소수에게 몰리도록 치우치게
+    store = bot1.get_store()
+    encode = bot1.get_allocator().encode
+    now = time.time()
+    codes = [encode(i) for i in range(count)]
+    with store.conn:
+        store.conn.executemany(
+            "INSERT OR IGNORE INTO codes (code, user_id, created_at) VALUES (?, ?, ?)",
+            ((code, str(i + 1), now) for i, code in enumerate(codes))
+        )
+        store.conn.executemany(
+            "INSERT OR REPLACE INTO referral_counts (user_id, cnt) VALUES (?, ?)",
+            ((str(i + 1), int(rng.paretovariate(1.2)) - 1) for i in range(count))
+        )
+        store.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('code_counter', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (str(count),)
+        )
+    bot1.leaderboard = None
+    started = time.perf_counter()
+    bot1.get_leaderboard()
+    return codes, time.perf_counter() - started
+
+def seed_clicks(db_path, args, rng, chunk=100_000):
+    # 트리거가 집계 테이블을 함께 채우므로 실제 /track 기록과 같은 상태가 됨
+    from click_store import connect
+    conn = connect(db_path)
+    today = datetime.date.today()
+    dates = [(today - datetime.timedelta(days=d)).isoformat() for d in range(7)]
+    done = 0
+    while done < args.clicks:
+        n = min(chunk, args.clicks - done)
+        rows = [
+            (f"video{rng.randrange(args.videos)}", str(int(rng.paretovariate(1.1)) % args.click_users + 1),
+             f"10.{(done + i) >> 16 & 255}.{(done + i) >> 8 & 255}.{(done + i) & 255}", rng.choice(dates))
+            for i in range(n)
+        ]
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO clicks (vid, uid, ip, date) VALUES (?, ?, ?, ?)", rows)
+        done += n
+    conn.close()
+
+def seed_rush(bot5, chat_id, limit):
+    key = str(chat_id)
+    event = bot5.store.ensure(key)
+    event.update({"emojis": ["🎉"], "participant_limit": limit, "event_started": True})
+    bot5.save_event_data()
+    bot5.sync_matcher(key)
+    bot5.announcer.forget(key)
+
+# ---------- 시나리오 ----------
+# 각 시나리오는 (핸들러, update, context) 목록을 만든다
+def start1(ctx, args, rng):
+    return [(ctx["bot1"].start1, FakeUpdate(ctx["bot"], rng.randrange(1, args.referrers + 1)), FakeContext(ctx["bot"]))
+            for _ in range(args.requests)]
+
+def start1_referral(ctx, args, rng):
+    # 처음 온 사용자가 기존 추천인의 코드로 들어옴 (추천 기록 + 순위표 갱신)
+    base = ctx["next_user"]
+    ctx["next_user"] += args.requests
+    codes = ctx["codes"]
+    return [(ctx["bot1"].start1, FakeUpdate(ctx["bot"], base + i), FakeContext(ctx["bot"], [rng.choice(codes)]))
+            for i in range(args.requests)]
+
+def code1(ctx, args, rng):
+    return [(ctx["bot1"].code1, FakeUpdate(ctx["bot"], rng.randrange(1, args.referrers + 1)), FakeContext(ctx["bot"]))
+            for _ in range(args.requests)]
+
+def code1_new(ctx, args, rng):
+    # 코드가 없는 사용자: 순번 할당 + outbox 기록
+    base = ctx["next_user"]
+    ctx["next_user"] += args.requests
+    return [(ctx["bot1"].code1, FakeUpdate(ctx["bot"], base + i), FakeContext(ctx["bot"]))
+            for i in range(args.requests)]
+
+def rank1(ctx, args, rng):
+    return [(ctx["bot1"].rank1, FakeUpdate(ctx["bot"], rng.randrange(1, args.referrers + 1)), FakeContext(ctx["bot"]))
+            for _ in range(args.requests)]
+
+def mystats(ctx, args, rng):
+    return [(ctx["bot4"].mystats, FakeUpdate(ctx["bot"], rng.randrange(1, args.click_users + 1)), FakeContext(ctx["bot"]))
+            for _ in range(args.requests)]
+
+def show_rank(ctx, args, rng):
+    return [(ctx["bot4"].show_rank, FakeUpdate(ctx["bot"], rng.randrange(1, args.click_users + 1)), FakeContext(ctx["bot"]))
+            for _ in range(args.requests)]
+
+def emoji_rush(ctx, args, rng):
+    # 인원보다 많은 사용자가 한꺼번에 몰림: 이모지 없는 잡담, 같은 사람의 반복 참여, 마감 후 메시지가 섞임
+    chat_id = ctx["rush_chat"]
+    users = int(args.rush_limit * 1.5) + 1
+    texts = ["선착순 🎉", "🎉🎉", "참여합니다 🎉 감사해요", "안녕하세요", "ㅋㅋㅋ 언제 시작해요?", "🔥 화이팅"]
+    calls = []
+    for _ in range(args.rush_messages):
+        update = FakeUpdate(ctx["bot"], 10_000_000 + rng.randrange(users), chat_id, rng.choice(texts))
+        calls.append((ctx["bot5"].handle_message, update, FakeContext(ctx["bot"])))
+    return calls
+
+# ---------- 답장 확인 ----------
+# 각 확인 함수는 시나리오가 끝난 뒤 봇이 보낸 내용을 보고 기대와 다르면 AssertionError
+def expect_replies(bot, args, prefix):
+    replies = bot.texts("reply_text")
+    assert len(replies) == args.requests, f"답장 {len(replies)}건 (기대 {args.requests}건)"
+    wrong = [text for text in replies if not text.startswith(prefix)]
+    assert not wrong, f"예상과 다른 답장: {wrong[0]!r}"
+    return replies
+
+def check_start1(ctx, args, bot):
+    expect_replies(bot, args, ctx["bot1"].load_config()["join_message"])
+    assert all("reply_markup" in kwargs for m, _, _, kwargs in bot.sent if m == "reply_text"), "버튼 없는 시작 메시지"
+
+def check_start1_referral(ctx, args, bot):
+    check_start1(ctx, args, bot)
+    # 새 사용자는 모두 추천으로 인정됨
+    credited = ctx["bot1"].get_store().conn.execute(
+        "SELECT COUNT(*) FROM referral_events WHERE CAST(referred_id AS INTEGER) >= ?", (1_000_000 + args.referrers,)
+    ).fetchone()[0]
+    assert credited >= args.requests, f"추천 인정 {credited}건 (기대 {args.requests}건 이상)"
+
+def check_code1(ctx, args, bot):
+    prefix = f"📮 당신의 추천코드 링크:\nhttps://t.me/{bot.username}?start="
+    expect_replies(bot, args, prefix)
+    # 미리 채운 사용자는 채울 때 만든 코드를 그대로 받음
+    codes = ctx["codes"]
+    for _, chat_id, text, _ in bot.sent:
+        if text and text.startswith(prefix):
+            assert text[len(prefix):] == codes[chat_id - 1], f"사용자 {chat_id} 의 코드가 다름: {text!r}"
+
+def check_code1_new(ctx, args, bot):
+    prefix = f"📮 당신의 추천코드 링크:\nhttps://t.me/{bot.username}?start="
+    replies = expect_replies(bot, args, prefix)
+    assert len(set(replies)) == len(replies), "새 사용자에게 같은 코드가 배정됨"
+
+def check_rank1(ctx, args, bot):
+    replies = expect_replies(bot, args, "🏆 추천 랭킹 (1/")
+    assert all("1위 - " in text for text in replies), "랭킹 첫 줄이 없음"
+
+def check_mystats(ctx, args, bot):
+    expect_replies(bot, args, "📊 현재까지 ")
+
+def check_show_rank(ctx, args, bot):
+    replies = expect_replies(bot, args, "🏆 공유 랭킹:")
+    assert all("1. 유저 " in text for text in replies), "랭킹 첫 줄이 없음"
+
+def check_emoji_rush(ctx, args, bot):
+    chat_id = ctx["rush_chat"]
+    event = ctx["bot5"].store.event(str(chat_id))
+    joined = len(event["participants"])
+    assert joined <= args.rush_limit, f"인원 초과: {joined}/{args.rush_limit}"
+    # 참여마다 답하지 않고 현황 메시지 하나를 모아서 수정
+    assert not bot.texts("reply_text"), "참여 메시지에 개별 답장함"
+    statuses = bot.texts("send_message", chat_id) + bot.texts("edit_message_text", chat_id)
+    assert statuses, "현황 메시지가 없음"
+    if joined == args.rush_limit:
+        assert any("마감" in text for text in statuses), "인원이 찼는데 마감 현황이 없음"
+
+# 이름 → (호출 목록 만들기, 답장 확인)
+SCENARIOS = {
+    "start1": (start1, check_start1),
+    "start1_referral": (start1_referral, check_start1_referral),
+    "code1": (code1, check_code1),
+    "code1_new": (code1_new, check_code1_new),
+    "rank1": (rank1, check_rank1),
+    "mystats": (mystats, check_mystats),
+    "show_rank": (show_rank, check_show_rank),
+    "emoji_rush": (emoji_rush, check_emoji_rush),
+}
+
+async def run_calls(calls, concurrency):
+    latencies = []
+    statuses = {}
+    it = iter(calls)
+
+    async def worker():
+        for handler, update, context in it:
+            started = time.perf_counter()
+            try:
+                await handler(update, context)
+                key = "ok"
+            except Exception as e:
+                key = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[key] = statuses.get(key, 0) + 1
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, time.perf_counter() - started, statuses)
+
+async def main():
+    args = parse_args()
+    data_dir = tempfile.mkdtemp(prefix="bench_handlers_")
+    # 봇/api_server 모두 import 시점에 경로와 설정을 읽으므로 먼저 환경변수를 지정
+    os.environ["BOT_DATA_DIR"] = data_dir
+    os.environ["DATA_DIR"] = data_dir  # api_server 도 같은 clicks.db 를 씀
+    os.environ["SHARE_API_URL"] = "http://bench"
+    os.environ["ADMIN_ID"] = "0"
+    os.environ["RATE_LIMIT_IP_PER_SEC"] = "0"
+    os.environ["RATE_LIMIT_LINK_PER_SEC"] = "0"
+    os.environ.pop("BOT_RUNTIME", None)
+    for i in range(1, 6):
+        os.environ.setdefault(f"BOT{i}_TOKEN", f"{i}:bench")
+
+    import httpx
+    import api_server
+    import bot1_code_creator as bot1
+    import bot4_share_tracker as bot4
+    import bot5_emoji_event as bot5
+    from stats_client import StatsClient
+
+    rng = random.Random(args.seed)
+    setup = {}
+    started = time.perf_counter()
+    codes, setup["leaderboard_build_s"] = seed_referrals(bot1, args.referrers, rng)
+    setup["seed_referrals_s"] = round(time.perf_counter() - started, 3)
+    setup["leaderboard_build_s"] = round(setup["leaderboard_build_s"], 3)
+    started = time.perf_counter()
+    seed_clicks(api_server.DB_PATH, args, rng)
+    setup["seed_clicks_s"] = round(time.perf_counter() - started, 3)
+    rush_chat = -1001234567890
+    seed_rush(bot5, rush_chat, args.rush_limit)
+    print(f"🌱 데이터 준비: {setup}")
+
+    bot = StubBot()
+    ctx = {
+        "bot": bot, "bot1": bot1, "bot4": bot4, "bot5": bot5,
+        "codes": codes, "next_user": 1_000_000 + args.referrers, "rush_chat": rush_chat,
+    }
+    results = {}
+    async with api_server.lifespan(api_server.app):
+        transport = httpx.ASGITransport(app=api_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # bot4 의 통계 조회를 같은 프로세스의 api_server 로 보냄
+            bot4.stats_client = StatsClient(bot4.SHARE_API_URL, lambda: client, ttl=bot4.STATS_TTL)
+            # 첫 호출의 초기화 비용(설정 파일 읽기, DB 연결 등)이 결과에 섞이지 않도록 예열
+            warmup = [(bot1.start1, FakeUpdate(bot, 1), FakeContext(bot)), (bot4.mystats, FakeUpdate(bot, 1), FakeContext(bot))]
+            await run_calls(warmup * 50, args.concurrency)
+            for name in args.scenarios.split(","):
+                build, check = SCENARIOS[name]
+                calls = build(ctx, args, rng)
+                bot.reset()
+                requests_before = bot4.stats_client.requests
+                results[name] = r = await run_calls(calls, args.concurrency)
+                r["bot_calls"] = dict(bot.calls)
+                if name == "emoji_rush":
+                    # 마감 현황/명단 전송까지 기다린 뒤 확인
+                    await asyncio.gather(*bot5.announcer.tasks.values(), return_exceptions=True)
+                assert set(r["statuses"]) <= {"ok"}, f"{name}: 핸들러 예외 {r['statuses']}"
+                check(ctx, args, bot)
+                if name in ("mystats", "show_rank"):
+                    r["stats_requests"] = bot4.stats_client.requests - requests_before
+                print(f"{name:16s} {r['ops_per_s']:>10.1f} ops/s  p50 {r['p50_ms']:.2f}ms  p99 {r['p99_ms']:.2f}ms  max {r['max_ms']:.2f}ms")
+            # 현황 메시지 수정 예약이 남아 있으면 정리
+            for task in list(bot5.announcer.tasks.values()):
+                task.cancel()
+
+    if "emoji_rush" in results:
+        event = bot5.store.event(str(rush_chat))
+        results["emoji_rush"]["participants"] = len(event["participants"])
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": vars(args),
+            "setup": setup,
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"📝 결과 저장: {args.out}")
+    if args.baseline:
+        print(f"📊 {args.baseline} 대비:")
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    asyncio.run(main())
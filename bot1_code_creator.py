@@ -1,72 +1,107 @@
 import os
-import json
-import random
-import string
 import asyncio
 import time
-import requests
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
+from telegram.ext import ApplicationBuilder, CallbackQueryHandler, CommandHandler, ContextTypes
 import nest_asyncio
+from referral_store import ReferralStore, import_legacy
+from leaderboard import Leaderboard
+from outbox import Outbox
+from code_allocator import CodeAllocator
+import settings_store
+from instrumentation import blocking_io, instrument
 
 nest_asyncio.apply()
 
 TOKEN = os.getenv("BOT1_TOKEN")
 ADMIN_ID = os.getenv("ADMIN_ID")
-API_URL = os.getenv("API_URL", "https://your-api-server.onrender.com/api/save_recommend")
-DB_PATH = "/mnt/data/referral_db.json"
-CONFIG_PATH = "/mnt/data/config.json"
+# 추천 코드 발급을 알릴 외부 API (예: https://.../api/save_recommend). 비어 있으면 보내지 않음
+API_URL = os.getenv("API_URL", "")
+BOT_DATA_DIR = os.getenv("BOT_DATA_DIR", "/mnt/data")  # 데이터 저장 디렉터리 (벤치마크/로컬 실행 시 변경)
+DB_PATH = os.path.join(BOT_DATA_DIR, "referral_db.json")  # 예전 JSON 저장소 (처음 실행 시 가져오기용)
+REFERRAL_DB_PATH = os.path.join(BOT_DATA_DIR, "referral.db")
+CONFIG_PATH = os.path.join(BOT_DATA_DIR, "config.json")
+# 추천 코드 섞기용 키 (없으면 저장소에 만들어 둔 키 사용)
+REFERRAL_CODE_KEY = os.getenv("REFERRAL_CODE_KEY")
+OUTBOX_PATH = os.path.join(BOT_DATA_DIR, "bot1_outbox.db")
+RANK_PAGE_SIZE = 20  # /rank1 한 페이지에 보여줄 인원
 
 print("🚀 BOT1 시작됨")
 
 # ---------- 데이터 로딩 ----------
-def load_db():
-    if not os.path.exists(DB_PATH):
-        return {"referrals": {}, "codes": {}, "counts": {}}
-    with open(DB_PATH, "r") as f:
-        return json.load(f)
+store = None
 
-def save_db(data):
-    with open(DB_PATH, "w") as f:
-        json.dump(data, f)
+def get_store():
+    global store
+    if store is None:
+        store = ReferralStore(REFERRAL_DB_PATH)
+        import_legacy(store, DB_PATH)
+    return store
 
+leaderboard = None
+
+def get_leaderboard():
+    # 시작 시 한 번만 저장소에서 채우고 이후에는 추천이 인정될 때마다 갱신
+    global leaderboard
+    if leaderboard is None:
+        leaderboard = Leaderboard(get_store().counts())
+    return leaderboard
+
+# ---------- API 전송 (outbox) ----------
+outbox = None
+
+async def send_recommends(client, items):
+    # API 는 한 번에 한 건씩 받으므로 묶음 크기 1, 같은 id 는 Idempotency-Key 로 전달
+    for item_id, payload in items:
+        resp = await client.post(API_URL, json=payload, headers={"Idempotency-Key": item_id})
+        resp.raise_for_status()
+
+def get_outbox():
+    global outbox
+    if outbox is None:
+        outbox = Outbox(OUTBOX_PATH)
+        outbox.register("save_recommend", send_recommends, batch_size=1)
+    return outbox
+
+async def start_outbox(application):
+    await get_outbox().start()
+
+async def stop_outbox(application):
+    await get_outbox().stop()
+
+DEFAULT_CONFIG = {
+    "group_link": "https://t.me/levi_group",
+    "channel_link": "https://t.me/levi_channel",
+    "join_message": "👋 Levi 커뮤니티에 오신 걸 환영합니다!\n아래 버튼을 눌러 참여해주세요!"
+}
+
+# 설정은 메모리 캐시에서 읽고 (다른 프로세스가 바꾸면 다시 읽음), 저장은 모아서 원자적으로
 def load_config():
-    default = {
-        "group_link": "https://t.me/levi_group",
-        "channel_link": "https://t.me/levi_channel",
-        "join_message": "👋 Levi 커뮤니티에 오신 걸 환영합니다!\n아래 버튼을 눌러 참여해주세요!"
-    }
-    if not os.path.exists(CONFIG_PATH):
-        return default
-    with open(CONFIG_PATH, "r") as f:
-        config = json.load(f)
-        for key in default:
-            if key not in config:
-                config[key] = default[key]
-        return config
+    return settings_store.document(CONFIG_PATH, DEFAULT_CONFIG).data
 
 def save_config(data):
-    with open(CONFIG_PATH, "w") as f:
-        json.dump(data, f)
+    settings_store.document(CONFIG_PATH, DEFAULT_CONFIG).replace(data)
 
 # ---------- 추천 코드 생성 ----------
-def generate_code():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+allocator = None
+
+def get_allocator():
+    global allocator
+    if allocator is None:
+        allocator = CodeAllocator(REFERRAL_CODE_KEY or get_store().secret("code_key"), length=6)
+    return allocator
 
 # ---------- 명령어 핸들러 ----------
 async def start1(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
-    db = load_db()
     config = load_config()
 
-    # 추천 코드 추적
+    # 추천 코드 추적 (같은 사용자는 한 번만 인정)
     if context.args:
-        ref_code = context.args[0]
-        if ref_code in db.get("codes", {}):
-            referrer_id = db["codes"][ref_code]
-            if referrer_id != user_id:
-                db["counts"][referrer_id] = db["counts"].get(referrer_id, 0) + 1
-                save_db(db)
+        with blocking_io("referral_db"):
+            referrer_id = get_store().record_referral(context.args[0], user_id)
+        if referrer_id is not None:
+            get_leaderboard().incr(referrer_id)
 
     # 메시지 + 버튼
     message_text = (
@@ -86,51 +121,65 @@ async def start1(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def code1(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
-    db = load_db()
-
-    if user_id in db["referrals"]:
-        code = db["referrals"][user_id]
-    else:
-        code = generate_code()
-        while code in db["codes"]:
-            code = generate_code()
-        db["referrals"][user_id] = code
-        db["codes"][code] = user_id
-        db["counts"][user_id] = 0
-        save_db(db)
-        try:
-            requests.post(API_URL, json={
-                "user_id": user_id,
-                "code": code,
-                "timestamp": time.time()
-            })
-        except Exception as e:
-            print(f"[API 오류] 추천코드 저장 실패: {e}")
+    store = get_store()
+
+    with blocking_io("referral_db"):
+        code = store.code_for_user(user_id)
+        if code is None:
+            code = store.allocate_code(user_id, get_allocator().encode)
+            if user_id not in get_leaderboard():
+                get_leaderboard().set(user_id, 0)
+            if API_URL:
+                get_outbox().add("save_recommend", {
+                    "user_id": user_id,
+                    "code": code,
+                    "timestamp": time.time()
+                }, item_id=f"code:{user_id}")
 
     bot_username = context.bot.username
     invite_link = f"https://t.me/{bot_username}?start={code}"
     await update.effective_message.reply_text(f"📮 당신의 추천코드 링크:\n{invite_link}")
 
+def render_rank_page(page, user_id):
+    board = get_leaderboard()
+    pages = max(1, (len(board) + RANK_PAGE_SIZE - 1) // RANK_PAGE_SIZE)
+    page = min(max(page, 0), pages - 1)
+    msg = f"🏆 추천 랭킹 ({page + 1}/{pages}):\n"
+    for rank, _, count in board.page(page * RANK_PAGE_SIZE, RANK_PAGE_SIZE):
+        msg += f"{rank}위 - {count}회 추천\n"
+    my_rank = board.rank(user_id)
+    if my_rank is not None:
+        msg += f"\n🙋 내 순위: {my_rank}위 ({board.score(user_id)}회 추천)"
+
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("◀ 이전", callback_data=f"rank1:{page - 1}"))
+    if page < pages - 1:
+        buttons.append(InlineKeyboardButton("다음 ▶", callback_data=f"rank1:{page + 1}"))
+    reply_markup = InlineKeyboardMarkup([buttons]) if buttons else None
+    return msg, reply_markup
+
 async def rank1(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    db = load_db()
-    counts = db.get("counts", {})
-    if not counts:
+    if not len(get_leaderboard()):
         await update.effective_message.reply_text("📉 아직 추천 내역이 없습니다.")
         return
-    sorted_users = sorted(counts.items(), key=lambda x: x[1], reverse=True)
-    msg = "🏆 추천 랭킹:\n"
-    for i, (user_id, count) in enumerate(sorted_users, 1):
-        msg += f"{i}위 - {count}회 추천\n"
-    await update.effective_message.reply_text(msg)
+    msg, reply_markup = render_rank_page(0, str(update.effective_user.id))
+    await update.effective_message.reply_text(msg, reply_markup=reply_markup)
+
+async def rank1_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    page = int(query.data.split(":", 1)[1])
+    msg, reply_markup = render_rank_page(page, str(update.effective_user.id))
+    await query.edit_message_text(msg, reply_markup=reply_markup)
 
 async def reset1(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
     if user_id != ADMIN_ID:
         await update.effective_message.reply_text("⛔ 관리자만 사용할 수 있습니다.")
         return
-    db = load_db()
-    db["counts"] = {}
-    save_db(db)
+    get_store().reset_counts()
+    get_leaderboard().clear()
     await update.effective_message.reply_text("✅ 추천 기록이 초기화되었습니다.")
 
 async def setlink1(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -177,23 +226,34 @@ async def info1(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ---------- 실행 ----------
 def safe_main():
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(main())
+    try:
+        loop.run_until_complete(main())
+    finally:
+        # 봇 프로세스는 atexit 없이 끝나므로 모아둔 설정 변경을 여기서 저장
+        settings_store.flush_all()
 
-async def main():
-    os.makedirs("/mnt/data", exist_ok=True)
+# 앱 구성 (단일 프로세스 런타임에서는 공유 HTTP 풀을 쓰는 builder 를 넘겨줌)
+def build_app(builder=None):
+    os.makedirs(BOT_DATA_DIR, exist_ok=True)
     global DB_PATH, CONFIG_PATH
-    DB_PATH = "/mnt/data/referral_db.json"
-    CONFIG_PATH = "/mnt/data/config.json"
+    DB_PATH = os.path.join(BOT_DATA_DIR, "referral_db.json")
+    CONFIG_PATH = os.path.join(BOT_DATA_DIR, "config.json")
     load_config()
-    app = ApplicationBuilder().token(TOKEN).build()
+    get_leaderboard()
+    app = (builder or ApplicationBuilder()).token(TOKEN).post_init(start_outbox).post_shutdown(stop_outbox).build()
     app.add_handler(CommandHandler(["start", "start1"], start1))
     app.add_handler(CommandHandler("code1", code1))
     app.add_handler(CommandHandler("rank1", rank1))
+    app.add_handler(CallbackQueryHandler(rank1_page, pattern=r"^rank1:\d+$"))
     app.add_handler(CommandHandler("reset1", reset1))
     app.add_handler(CommandHandler("setlink1", setlink1))
     app.add_handler(CommandHandler("setchannel1", setchannel1))
     app.add_handler(CommandHandler("setmsg1", setmsg1))
     app.add_handler(CommandHandler("info1", info1))
+    return instrument(app, "bot1")
+
+async def main():
+    app = build_app()
     await app.run_polling()
 
 if __name__ == "__main__":
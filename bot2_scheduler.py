@@ -1,9 +1,13 @@
 import os
-import json
 import asyncio
+import datetime
 import nest_asyncio
 from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
+from scheduler import CronExpr, Scheduler, MIN_INTERVAL
+from broadcast import BroadcastDispatcher
+import settings_store
+from instrumentation import instrument
 
 nest_asyncio.apply()
 
@@ -11,8 +15,13 @@ TOKEN = os.getenv("BOT2_TOKEN")
 ADMIN_ID = os.getenv("ADMIN_ID")  # 단일 관리자 ID
 
 # 저장 경로
-os.makedirs("/mnt/data", exist_ok=True)
-SETTINGS_PATH = "/mnt/data/schedule_settings.json"
+BOT_DATA_DIR = os.getenv("BOT_DATA_DIR", "/mnt/data")
+os.makedirs(BOT_DATA_DIR, exist_ok=True)
+SETTINGS_PATH = os.path.join(BOT_DATA_DIR, "schedule_settings.json")
+
+# cron 식을 해석할 시간대
+SCHEDULE_TZ = os.getenv("SCHEDULE_TZ", "Asia/Seoul")
+DEFAULT_JOB = "default"  # /setmsg2, /setinterval2, /start2, /stop2 가 다루는 작업
 
 print("🚀 BOT2 시작됨")
 
@@ -20,16 +29,66 @@ print("🚀 BOT2 시작됨")
 def is_admin(user_id: int) -> bool:
     return str(user_id) == ADMIN_ID
 
+def schedule_tz():
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(SCHEDULE_TZ)
+    except Exception:
+        return datetime.timezone.utc
+
 # 설정 로드 및 저장
+def migrate_settings(settings):
+    if "jobs" not in settings:
+        # 예전 단일 설정 {"message", "interval", "enabled"} → 관리자에게 보내는 기본 작업
+        settings = {"jobs": {DEFAULT_JOB: {
+            "name": DEFAULT_JOB,
+            "message": settings.get("message", ""),
+            "interval": settings.get("interval", 60),
+            "chats": [int(ADMIN_ID)] if ADMIN_ID else [],
+            "enabled": settings.get("enabled", False),
+            "missed": "skip",
+            "next_run": None,
+        }}}
+    return settings
+
+def settings_doc():
+    return settings_store.document(SETTINGS_PATH, {"jobs": {}}, migrate=migrate_settings)
+
 def load_settings():
-    if not os.path.exists(SETTINGS_PATH):
-        return {"message": "", "interval": 60, "enabled": False}
-    with open(SETTINGS_PATH, "r") as f:
-        return json.load(f)
+    return settings_doc().data
 
+# 스케줄러가 실행마다 next_run 을 저장하므로 몰아서 한 번에 씀
 def save_settings(settings):
-    with open(SETTINGS_PATH, "w") as f:
-        json.dump(settings, f)
+    settings_doc().replace(settings)
+
+def save_jobs(jobs):
+    save_settings({"jobs": jobs})
+
+scheduler = None
+dispatcher = None
+scheduler_task = None
+broadcast_stats = {}  # 작업 이름 → 마지막 전송 결과
+
+def default_job():
+    job = scheduler.jobs.get(DEFAULT_JOB)
+    if job is None:
+        job = {
+            "message": "", "interval": 60, "chats": [int(ADMIN_ID)] if ADMIN_ID else [],
+            "enabled": False, "missed": "skip",
+        }
+    return dict(job)
+
+def describe_schedule(job):
+    return f"cron `{job['cron']}`" if job.get("cron") else f"{job.get('interval', 60)}분마다"
+
+# 작업 실행: 지정된 채팅들에 속도 제한을 지키며 동시에 전송
+async def send_job(job):
+    if not job.get("message") or not job.get("chats"):
+        return
+    stats = await dispatcher.broadcast(job["chats"], job["message"])
+    broadcast_stats[job.get("name")] = stats
+    if stats["failed"]:
+        print(f"메시지 전송 오류 ({job.get('name')}): {stats['failed']}/{stats['total']}건 실패 {stats['errors']}")
 
 # /setmsg2 명령어
 async def setmsg2(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -40,9 +99,10 @@ async def setmsg2(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not message:
         await update.message.reply_text("❗ 사용법: /setmsg2 [전송할 메시지]")
         return
-    settings = load_settings()
-    settings["message"] = message
-    save_settings(settings)
+    job = default_job()
+    job["message"] = message
+    # 메시지만 바뀌므로 다음 전송 시각은 그대로
+    scheduler.upsert(DEFAULT_JOB, job, keep_next_run=True)
     await update.message.reply_text("✅ 전송할 메시지가 설정되었습니다.")
 
 # /setinterval2 명령어
@@ -52,41 +112,34 @@ async def setinterval2(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     try:
         minutes = int(context.args[0])
-        settings = load_settings()
-        settings["interval"] = minutes
-        save_settings(settings)
+        if minutes < MIN_INTERVAL:
+            raise ValueError
+        job = default_job()
+        job["interval"] = minutes
+        job.pop("cron", None)
+        # 바뀐 주기는 다음 대기부터가 아니라 지금부터 바로 적용됨
+        scheduler.upsert(DEFAULT_JOB, job)
         await update.message.reply_text(f"✅ 메시지 전송 주기가 {minutes}분으로 설정되었습니다.")
     except:
         await update.message.reply_text("❗ 사용법: /setinterval2 [분]")
 
 # /showsettings2 명령어
 async def showsettings2(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    settings = load_settings()
+    job = default_job()
     msg = f"""🔧 현재 설정:
-- 메시지: {settings.get("message", "")}
-- 주기: {settings.get("interval", 60)}분
-- 활성화 상태: {"✅ 활성화됨" if settings.get("enabled") else "⛔ 비활성화"}"""
+- 메시지: {job.get("message", "")}
+- 주기: {job.get("interval", 60)}분
+- 활성화 상태: {"✅ 활성화됨" if job.get("enabled") else "⛔ 비활성화"}"""
     await update.message.reply_text(msg)
 
-# 메시지 자동 전송 루프
-async def auto_sender(app):
-    while True:
-        settings = load_settings()
-        if settings.get("enabled") and settings.get("message"):
-            try:
-                await app.bot.send_message(chat_id=int(ADMIN_ID), text=settings["message"])
-            except Exception as e:
-                print(f"메시지 전송 오류: {e}")
-        await asyncio.sleep(settings.get("interval", 60) * 60)
-
 # /start2 명령어
 async def start2(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_admin(update.effective_user.id):
         await update.message.reply_text("⛔ 관리자만 사용 가능합니다.")
         return
-    settings = load_settings()
-    settings["enabled"] = True
-    save_settings(settings)
+    if DEFAULT_JOB not in scheduler.jobs:
+        scheduler.upsert(DEFAULT_JOB, default_job())
+    scheduler.set_enabled(DEFAULT_JOB, True)
     await update.message.reply_text("✅ 자동 메시지 전송이 시작되었습니다.")
 
 # /stop2 명령어
@@ -94,26 +147,125 @@ async def stop2(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_admin(update.effective_user.id):
         await update.message.reply_text("⛔ 관리자만 사용 가능합니다.")
         return
-    settings = load_settings()
-    settings["enabled"] = False
-    save_settings(settings)
+    if DEFAULT_JOB in scheduler.jobs:
+        scheduler.set_enabled(DEFAULT_JOB, False)
     await update.message.reply_text("🛑 자동 메시지 전송이 중단되었습니다.")
 
-# 메인 함수
-async def main():
-    app = ApplicationBuilder().token(TOKEN).build()
+# /addjob2 명령어: 이름 | 주기(분) 또는 cron 식 | 채팅ID,채팅ID | 메시지 | skip 또는 catchup(선택)
+async def addjob2(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("⛔ 관리자만 사용 가능합니다.")
+        return
+    usage = "❗ 사용법: /addjob2 이름 | 주기(분) 또는 cron식 | 채팅ID,채팅ID | 메시지 | skip 또는 catchup(선택)"
+    parts = [p.strip() for p in " ".join(context.args).split("|")]
+    if len(parts) < 4 or not parts[0] or not parts[3]:
+        await update.message.reply_text(usage)
+        return
+    name, schedule, chats_text, message = parts[:4]
+    missed = parts[4] if len(parts) > 4 and parts[4] else "skip"
+    job = {"message": message, "enabled": True, "missed": missed}
+    try:
+        if missed not in ("skip", "catchup"):
+            raise ValueError
+        if schedule.isdigit():
+            job["interval"] = int(schedule)
+            if job["interval"] < MIN_INTERVAL:
+                raise ValueError
+        else:
+            # 형식은 맞아도 실행 시각이 없는 식(예: 2월 31일)은 저장 전에 거름
+            CronExpr(schedule).next_after(datetime.datetime.now(schedule_tz()))
+            job["cron"] = schedule
+        job["chats"] = [int(c) for c in chats_text.split(",") if c.strip()] or [update.effective_chat.id]
+    except ValueError as e:
+        await update.message.reply_text(f"⚠️ {e}\n{usage}" if str(e) else usage)
+        return
+    scheduler.upsert(name, job)
+    await update.message.reply_text(f"✅ 작업 '{name}' 등록: {describe_schedule(job)}, 채팅 {len(job['chats'])}곳")
+
+# /jobs2 명령어
+async def jobs2(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not scheduler.jobs:
+        await update.message.reply_text("📭 등록된 작업이 없습니다.")
+        return
+    tz = schedule_tz()
+    lines = ["🗓️ 작업 목록:"]
+    for name, job in sorted(scheduler.jobs.items()):
+        state = "✅" if job.get("enabled") else "⏸️"
+        next_run = job.get("next_run")
+        when = datetime.datetime.fromtimestamp(next_run, tz).strftime("%m-%d %H:%M") if next_run else "-"
+        lines.append(f"{state} {name} - {describe_schedule(job)}, 채팅 {len(job.get('chats', []))}곳, 다음: {when}")
+        stats = broadcast_stats.get(name)
+        if stats:
+            lines.append(f"   └ 최근 전송: 성공 {stats['sent']}/{stats['total']}, 실패 {stats['failed']}, {stats['elapsed']}초")
+    await update.message.reply_text("\n".join(lines))
+
+async def _toggle_job(update, context, enabled):
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("⛔ 관리자만 사용 가능합니다.")
+        return
+    if not context.args or context.args[0] not in scheduler.jobs:
+        await update.message.reply_text("⚠️ 작업 이름을 확인해주세요. (/jobs2)")
+        return
+    scheduler.set_enabled(context.args[0], enabled)
+    await update.message.reply_text(f"{'▶️' if enabled else '⏸️'} 작업 '{context.args[0]}' {'재개' if enabled else '일시정지'}")
+
+# /pausejob2, /resumejob2 명령어
+async def pausejob2(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await _toggle_job(update, context, False)
+
+async def resumejob2(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await _toggle_job(update, context, True)
+
+# /removejob2 명령어
+async def removejob2(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("⛔ 관리자만 사용 가능합니다.")
+        return
+    if not context.args or context.args[0] not in scheduler.jobs:
+        await update.message.reply_text("⚠️ 작업 이름을 확인해주세요. (/jobs2)")
+        return
+    scheduler.remove(context.args[0])
+    await update.message.reply_text(f"🗑️ 작업 '{context.args[0]}' 삭제 완료")
+
+async def start_scheduler(app):
+    global scheduler_task
+    scheduler.restore()
+    scheduler_task = asyncio.create_task(scheduler.run())
+
+async def stop_scheduler(app):
+    if scheduler_task:
+        scheduler_task.cancel()
+
+# 앱 구성
+def build_app(builder=None):
+    global scheduler, dispatcher
+    app = (builder or ApplicationBuilder()).token(TOKEN).post_init(start_scheduler).post_shutdown(stop_scheduler).build()
+    dispatcher = BroadcastDispatcher(app.bot)
+    scheduler = Scheduler(load_settings()["jobs"], send_job, save_jobs, tz=schedule_tz())
     app.add_handler(CommandHandler("setmsg2", setmsg2))
     app.add_handler(CommandHandler("setinterval2", setinterval2))
     app.add_handler(CommandHandler("showsettings2", showsettings2))
     app.add_handler(CommandHandler("start2", start2))
     app.add_handler(CommandHandler("stop2", stop2))
+    app.add_handler(CommandHandler("addjob2", addjob2))
+    app.add_handler(CommandHandler("jobs2", jobs2))
+    app.add_handler(CommandHandler("pausejob2", pausejob2))
+    app.add_handler(CommandHandler("resumejob2", resumejob2))
+    app.add_handler(CommandHandler("removejob2", removejob2))
+    return instrument(app, "bot2")
 
-    asyncio.create_task(auto_sender(app))
+# 메인 함수
+async def main():
+    app = build_app()
     print("✅ bot2_scheduler is running")
     await app.run_polling()
 
 def safe_main():
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        # 봇 프로세스는 atexit 없이 끝나므로 모아둔 설정 변경을 여기서 저장
+        settings_store.flush_all()
 
 if __name__ == "__main__":
     safe_main()
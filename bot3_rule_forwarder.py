@@ -1,8 +1,13 @@
 import os
-import json
+import html
+import asyncio
 from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, filters
+from telegram.constants import ParseMode
+from telegram.error import TelegramError
+from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler, filters
+import settings_store
 import nest_asyncio
+from instrumentation import instrument
 
 nest_asyncio.apply()
 
@@ -10,28 +15,97 @@ TOKEN = os.getenv("BOT3_TOKEN")
 ADMIN_ID = os.getenv("ADMIN_ID")
 
 # 영구 저장 경로 설정
-os.makedirs("/mnt/data", exist_ok=True)
-SETTINGS_PATH = "/mnt/data/bot3_rule.json"
+BOT_DATA_DIR = os.getenv("BOT_DATA_DIR", "/mnt/data")
+os.makedirs(BOT_DATA_DIR, exist_ok=True)
+SETTINGS_PATH = os.path.join(BOT_DATA_DIR, "bot3_rule.json")
 
-# 기본 설정값
-config = {
-    "rule_message": "📌 기본 룰입니다. /setrule3로 변경할 수 있습니다."
+# 입장 알림: 이 시간(초) 동안 들어온 사람들을 모아 룰 메시지 하나로 안내
+JOIN_WINDOW = float(os.getenv("RULE_JOIN_WINDOW", "10"))
+JOIN_MENTION_LIMIT = int(os.getenv("RULE_JOIN_MENTION_LIMIT", "30"))
+
+# 기본 설정값 (chat_rules: 채팅별 룰, rule_posts: 채팅별 마지막 룰 안내 메시지 ID)
+DEFAULT_CONFIG = {
+    "rule_message": "📌 기본 룰입니다. /setrule3로 변경할 수 있습니다.",
+    "chat_rules": {},
+    "rule_posts": {},
 }
 
-# 설정 불러오기
+def settings_doc():
+    return settings_store.document(SETTINGS_PATH, DEFAULT_CONFIG)
+
+# 설정 불러오기 (메모리 캐시, 다른 프로세스가 바꾸면 다시 읽음)
 def load_settings():
-    if os.path.exists(SETTINGS_PATH):
-        with open(SETTINGS_PATH, "r") as f:
-            config.update(json.load(f))
+    return settings_doc().data
 
 # 설정 저장하기
 def save_settings():
-    with open(SETTINGS_PATH, "w") as f:
-        json.dump(config, f)
+    settings_doc().save()
+
+# 채팅별 룰이 없으면 전체 기본 룰
+def rule_for(chat_id):
+    config = load_settings()
+    return config["chat_rules"].get(str(chat_id), config["rule_message"])
+
+# ---------- 입장 묶음 안내 ----------
+class JoinBatcher:
+    """채팅별로 window 초 동안 들어온 신규 멤버를 모아 룰 메시지 하나로 안내한다.
+
+    첫 입장 때 타이머를 걸고, 끝나면 모인 사람들을 멘션해 룰을 보낸 뒤
+    그 채팅의 이전 룰 안내 메시지는 지운다. 채팅마다 window 당 최대 한 번만 보낸다.
+    """
+
+    def __init__(self, window=JOIN_WINDOW, mention_limit=JOIN_MENTION_LIMIT):
+        self.window = window
+        self.mention_limit = mention_limit
+        self.pending = {}  # chat_id → [user, ...]
+        self.tasks = {}
+
+    def add(self, bot, chat_id, users):
+        batch = self.pending.setdefault(chat_id, [])
+        batch.extend(u for u in users if not u.is_bot)
+        if batch and chat_id not in self.tasks:
+            self.tasks[chat_id] = asyncio.create_task(self._flush_later(bot, chat_id))
+
+    async def _flush_later(self, bot, chat_id):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self.tasks.pop(chat_id, None)
+        users = self.pending.pop(chat_id, [])
+        if users:
+            await self.flush(bot, chat_id, users)
+
+    def render(self, chat_id, users):
+        mentions = ", ".join(u.mention_html() for u in users[:self.mention_limit])
+        if len(users) > self.mention_limit:
+            mentions += f" 외 {len(users) - self.mention_limit}명"
+        return f"👋 {mentions} 님 환영합니다!\n\n{html.escape(rule_for(chat_id))}"
+
+    async def flush(self, bot, chat_id, users):
+        try:
+            msg = await bot.send_message(chat_id=chat_id, text=self.render(chat_id, users), parse_mode=ParseMode.HTML)
+        except TelegramError as e:
+            print(f"룰 안내 전송 오류 ({chat_id}): {e}")
+            return
+        rule_posts = load_settings()["rule_posts"]
+        previous = rule_posts.get(str(chat_id))
+        rule_posts[str(chat_id)] = msg.message_id
+        save_settings()
+        if previous:
+            try:
+                await bot.delete_message(chat_id=chat_id, message_id=previous)
+            except TelegramError:
+                pass  # 이미 지워졌거나 48시간이 지난 메시지
+
+join_batcher = JoinBatcher()
+
+# 신규 멤버 입장
+async def on_new_members(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    join_batcher.add(context.bot, update.effective_chat.id, update.message.new_chat_members)
 
 # 룰 메시지 전송
 async def rule3(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.effective_message.reply_text(config["rule_message"])
+    await update.effective_message.reply_text(rule_for(update.effective_chat.id))
 
 # 룰 메시지 설정
 async def setrule3(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -45,24 +119,53 @@ async def setrule3(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❗ 설정할 룰 메시지를 입력해주세요.")
         return
 
-    config["rule_message"] = new_rule
+    load_settings()["rule_message"] = new_rule
     save_settings()
     await update.message.reply_text("✅ 룰 메시지가 설정되었습니다.")
 
-# 메인 실행
-async def main():
+# 현재 채팅 전용 룰 설정 (내용 없이 보내면 기본 룰로 되돌림)
+async def setchatrule3(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+    if user_id != ADMIN_ID:
+        await update.message.reply_text("⛔ 관리자만 변경할 수 있습니다.")
+        return
+
+    chat_key = str(update.effective_chat.id)
+    new_rule = " ".join(context.args)
+    if not new_rule:
+        load_settings()["chat_rules"].pop(chat_key, None)
+        save_settings()
+        await update.message.reply_text("♻️ 이 채팅의 룰을 기본 룰로 되돌렸습니다.")
+        return
+
+    load_settings()["chat_rules"][chat_key] = new_rule
+    save_settings()
+    await update.message.reply_text("✅ 이 채팅 전용 룰 메시지가 설정되었습니다.")
+
+# 앱 구성
+def build_app(builder=None):
     load_settings()
-    app = ApplicationBuilder().token(TOKEN).build()
+    app = (builder or ApplicationBuilder()).token(TOKEN).build()
 
     app.add_handler(CommandHandler("rule3", rule3, filters=filters.ALL))
     app.add_handler(CommandHandler("setrule3", setrule3, filters=filters.ALL))
+    app.add_handler(CommandHandler("setchatrule3", setchatrule3, filters=filters.ALL))
+    app.add_handler(MessageHandler(filters.StatusUpdate.NEW_CHAT_MEMBERS, on_new_members))
+    return instrument(app, "bot3")
 
+# 메인 실행
+async def main():
+    app = build_app()
     print("✅ bot3_rule_forwarder is running")
     await app.run_polling()
 
 def safe_main():
     import asyncio
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        # 봇 프로세스는 atexit 없이 끝나므로 모아둔 설정 변경을 여기서 저장
+        settings_store.flush_all()
 
 if __name__ == "__main__":
     safe_main()
@@ -1,24 +1,31 @@
 import os
 import json
 import asyncio
-import sqlite3
-import datetime
 import hashlib
-import httpx
 from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
 import nest_asyncio
+from outbox import Outbox
+from stats_client import StatsClient
+from click_store import connect, init_click_db, uid_count, top_uids
+from instrumentation import blocking_io, instrument
 
 nest_asyncio.apply()
 
 TOKEN = os.getenv("BOT4_TOKEN")
 ADMIN_ID = os.getenv("ADMIN_ID")
 SHARE_API_URL = os.getenv("SHARE_API_URL", "https://your-api.com")
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")  # API 서버의 /api/admin/* 인증 키
 TRACK_URL = SHARE_API_URL + "/track"
 
-VIDEO_DATA_PATH = "/mnt/data/video_data.json"
-DB_PATH = "/mnt/data/clicks.db"
-os.makedirs("/mnt/data", exist_ok=True)
+BOT_DATA_DIR = os.getenv("BOT_DATA_DIR", "/mnt/data")
+VIDEO_DATA_PATH = os.path.join(BOT_DATA_DIR, "video_data.json")
+VIDEO_SYNC_PATH = os.path.join(BOT_DATA_DIR, "video_sync.json")  # API 서버 카탈로그 version 기록
+DB_PATH = os.path.join(BOT_DATA_DIR, "clicks.db")
+OUTBOX_PATH = os.path.join(BOT_DATA_DIR, "bot4_outbox.db")
+RANK_LIMIT = 50  # /rank4 에 표시할 최대 인원
+STATS_TTL = float(os.getenv("STATS_CACHE_TTL", "10"))  # API 서버 통계 캐시 시간(초)
+os.makedirs(BOT_DATA_DIR, exist_ok=True)
 
 # ---------- 데이터 로드/저장 ----------
 def load_videos():
@@ -31,25 +38,120 @@ def save_videos(data):
     with open(VIDEO_DATA_PATH, "w") as f:
         json.dump(data, f)
 
+def load_sync_state():
+    if os.path.exists(VIDEO_SYNC_PATH):
+        with open(VIDEO_SYNC_PATH, "r") as f:
+            return json.load(f)
+    return {"server_version": 0}
+
+def save_sync_state(state):
+    with open(VIDEO_SYNC_PATH, "w") as f:
+        json.dump(state, f)
+
+# ---------- API 서버 동기화 ----------
+def video_payload(video_id, info):
+    return {
+        "video_id": video_id,
+        "title": info.get("title", ""),
+        "video_url": info.get("video_url", ""),
+        "thumbnail": info.get("thumbnail", "")
+    }
+
+outbox = None
+
+async def send_video_syncs(client, items):
+    # 쌓인 변경을 영상별 최종 상태로 합쳐 한 번의 요청으로 보내고 서버 카탈로그 version 을 기록
+    upserts, deletes = {}, set()
+    for _, payload in items:
+        for video in payload["upserts"]:
+            upserts[video["video_id"]] = video
+            deletes.discard(video["video_id"])
+        for vid in payload["deletes"]:
+            upserts.pop(vid, None)
+            deletes.add(vid)
+    resp = await client.post(
+        SHARE_API_URL + "/api/sync_videos",
+        json={"upserts": list(upserts.values()), "deletes": sorted(deletes)}
+    )
+    resp.raise_for_status()
+    save_sync_state({"server_version": resp.json()["version"]})
+
+def get_outbox():
+    global outbox
+    if outbox is None:
+        outbox = Outbox(OUTBOX_PATH)
+        outbox.register("sync_video", send_video_syncs)
+    return outbox
+
+# 클릭은 API 서버가 기록하므로 통계도 API 서버에 물어봄 (outbox 의 연결 풀을 같이 씀)
+stats_client = None
+
+def get_stats():
+    global stats_client
+    if stats_client is None:
+        stats_client = StatsClient(SHARE_API_URL, lambda: get_outbox().client, ttl=STATS_TTL)
+    return stats_client
+
+def sync_videos(upserts=(), deletes=()):
+    # outbox 에 적어두기만 하고 바로 반환 (전송은 백그라운드 작업자가 재시도 포함 처리)
+    get_outbox().add("sync_video", {"upserts": list(upserts), "deletes": list(deletes)})
+
+async def reconcile_videos():
+    # 재시작 시 마지막 동기화 이후 서버에서 달라진 영상만 받아서 로컬 기준으로 맞춤
+    since = load_sync_state().get("server_version", 0)
+    try:
+        resp = await get_outbox().client.get(SHARE_API_URL + "/api/videos/changes", params={"since": since})
+        resp.raise_for_status()
+        changes = resp.json()
+    except Exception as e:
+        print(f"❌ API 동기화 확인 실패: {e}")
+        return
+
+    videos = load_videos()
+    server = changes["upserts"]
+    full = changes["full"] or since == 0
+    changed = set(server) | set(changes["deletes"])
+    if full:
+        changed |= set(videos)
+
+    fields = ("title", "video_url", "thumbnail")
+    upserts, deletes, remote_only = [], [], []
+    for vid in changed:
+        info = videos.get(vid)
+        if info is not None:
+            remote = server.get(vid)
+            if remote is None or any(remote.get(k) != info.get(k) for k in fields):
+                upserts.append(video_payload(vid, info))
+        elif vid in server:
+            remote_only.append(vid)
+
+    if full:
+        # 전체 비교에서 로컬에 없는 영상은 지우지 않음 (새 서버/유실된 볼륨이면 서버 카탈로그가 통째로 지워짐)
+        if remote_only:
+            print(f"⚠️ 서버에만 있는 영상 {len(remote_only)}개는 지우지 않음 (확인 후 /deletevideo4 영상ID 로 삭제): {sorted(remote_only)[:20]}")
+    else:
+        deletes = remote_only
+
+    if upserts or deletes:
+        sync_videos(upserts, deletes)
+    else:
+        save_sync_state({"server_version": changes["version"]})
+
+async def start_sync(application):
+    await get_outbox().start()
+    await reconcile_videos()
+
+async def stop_sync(application):
+    await get_outbox().stop()
+
 # ---------- 고정된 video_id 생성 ----------
 def generate_video_id(title: str) -> str:
     return hashlib.sha256(title.encode()).hexdigest()[:10]
 
 # ---------- DB 초기화 ----------
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS clicks (
-            vid TEXT,
-            uid TEXT,
-            ip TEXT,
-            date TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(vid, uid, ip, date)
-        )
-    ''')
-    conn.commit()
+    conn = connect(DB_PATH)
+    init_click_db(conn)
     conn.close()
 
 # ---------- 관리자 확인 ----------
@@ -78,19 +180,7 @@ async def register_video(update: Update, context: ContextTypes.DEFAULT_TYPE):
     save_videos(videos)
 
     # --- API 서버에 동기화 ---
-    try:
-        async with httpx.AsyncClient() as client:
-            await client.post(
-                SHARE_API_URL + "/api/sync_video",
-                json={
-                    "video_id": video_id,
-                    "title": title,
-                    "video_url": video_url,
-                    "thumbnail": thumbnail
-                }
-            )
-    except Exception as e:
-        print(f"❌ API 동기화 실패: {e}")
+    sync_videos(upserts=[video_payload(video_id, videos[video_id])])
 
     await update.message.reply_text(f"✅ 등록 완료\n영상ID: {video_id}", parse_mode='Markdown')
 
@@ -125,9 +215,12 @@ async def delete_video(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if video_id in videos:
         del videos[video_id]
         save_videos(videos)
+        sync_videos(deletes=[video_id])
         await update.message.reply_text(f"🗑️ 영상 {video_id} 삭제 완료")
     else:
-        await update.message.reply_text("⚠️ 영상 ID 없음")
+        # 로컬에는 없고 API 서버에만 남은 영상 (전체 동기화에서는 자동으로 지우지 않음)
+        sync_videos(deletes=[video_id])
+        await update.message.reply_text(f"⚠️ 로컬에 없는 영상 ID 입니다. API 서버에 {video_id} 삭제를 요청했습니다.")
 
 async def edit_video(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_admin(update):
@@ -151,23 +244,31 @@ async def edit_video(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if video_url:
         videos[video_id]["video_url"] = video_url
     save_videos(videos)
+    sync_videos(upserts=[video_payload(video_id, videos[video_id])])
     await update.message.reply_text("✅ 영상 정보 수정 완료")
 
 async def mystats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT COUNT(*) FROM clicks WHERE uid = ?", (user_id,))
-    count = c.fetchone()[0]
-    conn.close()
+    try:
+        count = await get_stats().uid_count(user_id)
+    except Exception as e:
+        # API 서버에 닿지 않으면 로컬 DB 로 대신 답함
+        print(f"⚠️ 통계 조회 실패, 로컬 DB 사용: {e}")
+        with blocking_io("clicks_db"):
+            conn = connect(DB_PATH)
+            count = uid_count(conn, user_id)
+            conn.close()
     await update.message.reply_text(f"📊 현재까지 {count}명이 당신의 링크를 클릭했습니다.")
 
 async def show_rank(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT uid, COUNT(*) as cnt FROM clicks GROUP BY uid ORDER BY cnt DESC")
-    rows = c.fetchall()
-    conn.close()
+    try:
+        rows = await get_stats().top(RANK_LIMIT)
+    except Exception as e:
+        print(f"⚠️ 랭킹 조회 실패, 로컬 DB 사용: {e}")
+        with blocking_io("clicks_db"):
+            conn = connect(DB_PATH)
+            rows = top_uids(conn, RANK_LIMIT)
+            conn.close()
     if not rows:
         await update.message.reply_text("🏎️ 아직 클릭 데이터가 없습니다.")
         return
@@ -176,21 +277,40 @@ async def show_rank(update: Update, context: ContextTypes.DEFAULT_TYPE):
         msg += f"{i}. 유저 {uid} - {count}회\n"
     await update.message.reply_text(msg)
 
+async def admin_request(path):
+    # 클릭은 API 서버에만 쌓이므로 초기화/재계산도 API 서버에 요청하고 통계 캐시를 비움
+    try:
+        resp = await get_outbox().client.post(SHARE_API_URL + path, headers={"X-Admin-Key": ADMIN_API_KEY})
+        resp.raise_for_status()
+    except Exception as e:
+        print(f"❌ API 관리 요청 실패 ({path}): {e}")
+        return False
+    get_stats().clear()
+    return True
+
 async def reset_clicks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_admin(update):
         await update.message.reply_text("⛔ 관리자만 사용할 수 있습니다.")
         return
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("DELETE FROM clicks")
-    conn.commit()
-    conn.close()
-    await update.message.reply_text("✅ 클릭 데이터가 초기화되었습니다.")
+    if await admin_request("/api/admin/reset_clicks"):
+        await update.message.reply_text("✅ 클릭 데이터가 초기화되었습니다.")
+    else:
+        await update.message.reply_text("❌ API 서버에 요청하지 못했습니다. 잠시 후 다시 시도하세요.")
+
+async def rebuild_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update):
+        await update.message.reply_text("⛔ 관리자만 사용할 수 있습니다.")
+        return
+    if await admin_request("/api/admin/rebuild_stats"):
+        await update.message.reply_text("✅ 클릭 집계가 다시 계산되었습니다.")
+    else:
+        await update.message.reply_text("❌ API 서버에 요청하지 못했습니다. 잠시 후 다시 시도하세요.")
 
 # ---------- 실행 ----------
-async def main():
+# 앱 구성
+def build_app(builder=None):
     init_db()
-    app = ApplicationBuilder().token(TOKEN).build()
+    app = (builder or ApplicationBuilder()).token(TOKEN).post_init(start_sync).post_shutdown(stop_sync).build()
     app.add_handler(CommandHandler("register4", register_video))
     app.add_handler(CommandHandler("getlink4", get_link))
     app.add_handler(CommandHandler("listvideos4", list_videos))
@@ -199,6 +319,11 @@ async def main():
     app.add_handler(CommandHandler("mystats4", mystats))
     app.add_handler(CommandHandler("rank4", show_rank))
     app.add_handler(CommandHandler("reset4", reset_clicks))
+    app.add_handler(CommandHandler("rebuildstats4", rebuild_stats))
+    return instrument(app, "bot4")
+
+async def main():
+    app = build_app()
     print("✅ bot4_share_tracker (local+sqlite+sync) is running")
     await app.run_polling()
 
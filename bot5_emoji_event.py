@@ -1,139 +1,319 @@
 import os
-import json
+import time
 import asyncio
 import nest_asyncio
 from telegram import Update
+from telegram.error import BadRequest, RetryAfter, TelegramError
 from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters
+from event_store import EventStore, WILDCARD
+from emoji_match import EmojiMatcher, graphemes
+from instrumentation import blocking_io, instrument
 
 # 환경변수 및 경로
 TOKEN = os.getenv("BOT5_TOKEN")
 ADMIN_IDS = {int(os.getenv("ADMIN_ID", "0"))}
-DATA_PATH = "/mnt/data/bot5_event.json"
-os.makedirs("/mnt/data", exist_ok=True)
+BOT_DATA_DIR = os.getenv("BOT_DATA_DIR", "/mnt/data")
+DATA_PATH = os.path.join(BOT_DATA_DIR, "bot5_event.json")
+EVENT_COMPACT_EVERY = int(os.getenv("EVENT_COMPACT_EVERY", "500"))
+ANNOUNCE_INTERVAL = float(os.getenv("EVENT_ANNOUNCE_INTERVAL", "3"))  # 현황 메시지 수정 최소 간격(초)
+ANNOUNCE_RECENT = 15  # 현황 메시지에 보여줄 최근 참여자 수
+os.makedirs(BOT_DATA_DIR, exist_ok=True)
 
 nest_asyncio.apply()
 
-# 기본 구조
-event_data = {
-    "emoji_to_track": None,
-    "participant_limit": None,
-    "participants": [],
-    "event_started": False
-}
+# 기본 구조: 채팅 ID(문자열) → 이벤트, "*" 는 모든 채팅에 적용 (참여는 저널에 덧붙이고, 설정 변경 시 스냅샷으로 정리)
+store = EventStore(DATA_PATH, compact_every=EVENT_COMPACT_EVERY)
+
+# 진행 중인 이벤트들의 이모지를 한 오토마톤에 등록 (key → 등록한 이모지 목록)
+matcher = EmojiMatcher()
+registered = {}
+
+def sync_matcher(key):
+    # 해당 이벤트만 오토마톤에서 빼고 다시 넣음 (다른 이벤트는 그대로)
+    matcher.remove_key(key, registered.pop(key, []))
+    event = store.event(key)
+    if event and event["event_started"] and event["emojis"]:
+        for emoji in event["emojis"]:
+            matcher.add(key, emoji)
+        registered[key] = list(event["emojis"])
 
 # 파일 불러오기 / 저장
 def load_event_data():
-    global event_data
-    if os.path.exists(DATA_PATH):
-        with open(DATA_PATH, "r") as f:
-            event_data = json.load(f)
+    store.load()
+    for key in list(registered):
+        sync_matcher(key)
+    for key in store.events:
+        sync_matcher(key)
 
 def save_event_data():
-    with open(DATA_PATH, "w") as f:
-        json.dump(event_data, f)
+    store.save()
+
+# ---------- 참여 현황 안내 ----------
+def render_status(event, final=False):
+    participants = event["participants"]
+    count, limit = len(participants), event["participant_limit"]
+    head = f"🏁 선착순 마감! ({count}/{limit})" if final else f"🎉 선착순 이벤트 진행 중 ({count}/{limit})"
+    recent = [p["name"] for p in participants[-ANNOUNCE_RECENT:]]
+    if not recent:
+        return head
+    return head + "\n최근 참여: " + ", ".join(reversed(recent))
+
+def render_summary(event, limit=4000):
+    # 최종 명단을 텔레그램 메시지 길이에 맞춰 나눔
+    chunks, current = [], f"🏁 선착순 마감! 참여자 {len(event['participants'])}명:"
+    for i, p in enumerate(event["participants"]):
+        line = f"\n{i+1}. {p['name']}"
+        if len(current) + len(line) > limit:
+            chunks.append(current)
+            current = line.lstrip("\n")
+        else:
+            current += line
+    chunks.append(current)
+    return chunks
+
+class EventAnnouncer:
+    """참여할 때마다 답장하는 대신 이벤트·채팅마다 현황 메시지 하나를 두고 interval 초에 한 번만 수정한다.
+
+    참여가 몰리면 interval 동안의 변경을 한 번의 수정으로 합치고,
+    인원이 차면 그 이벤트의 모든 채팅 현황을 마감으로 바꾼 뒤 최종 명단을 한 번만 보낸다.
+    같은 현황 메시지에 대한 전송은 채팅마다 잠금으로 순서대로 처리해 마감 뒤에 옛 현황이 덮어쓰지 않는다.
+    """
+
+    def __init__(self, interval=ANNOUNCE_INTERVAL):
+        self.interval = interval
+        self.messages = {}    # (key, chat_id) → 현황 메시지 ID
+        self.last_edit = {}   # (key, chat_id) → 마지막 전송 시각
+        self.tasks = {}
+        self.locks = {}       # (key, chat_id) → 전송 잠금
+        self.finished = set()
+
+    def notify(self, bot, key, chat_id):
+        slot = (key, chat_id)
+        if slot not in self.tasks and key not in self.finished:
+            self.tasks[slot] = asyncio.create_task(self._publish_later(bot, key, chat_id))
+
+    async def _publish_later(self, bot, key, chat_id):
+        slot = (key, chat_id)
+        wait = self.last_edit.get(slot, 0) + self.interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        # 여기서부터 들어오는 참여는 다음 수정으로 넘어감
+        self.tasks.pop(slot, None)
+        event = store.event(key)
+        if event is not None:
+            await self._publish(bot, key, chat_id, lambda: render_status(event))
+
+    async def _publish(self, bot, key, chat_id, render, final=False):
+        slot = (key, chat_id)
+        lock = self.locks.setdefault(slot, asyncio.Lock())
+        async with lock:
+            # 잠금을 기다리는 사이 마감됐으면 진행 중 현황은 보내지 않음
+            if not final and key in self.finished:
+                return
+            while True:
+                self.last_edit[slot] = time.monotonic()
+                message_id = self.messages.get(slot)
+                try:
+                    if message_id:
+                        await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=render())
+                    else:
+                        msg = await bot.send_message(chat_id=chat_id, text=render())
+                        self.messages[slot] = msg.message_id
+                    return
+                except RetryAfter as e:
+                    retry_after = e.retry_after
+                    if hasattr(retry_after, "total_seconds"):
+                        retry_after = retry_after.total_seconds()
+                    if final:
+                        # 마감 현황은 놓치면 안 되므로 기다렸다가 다시 보냄
+                        await asyncio.sleep(retry_after)
+                        continue
+                    self.last_edit[slot] = time.monotonic() + retry_after - self.interval
+                    self.notify(bot, key, chat_id)
+                    return
+                except BadRequest as e:
+                    if "not modified" in str(e):
+                        return
+                    # 현황 메시지가 지워졌으면 다음에 새로 보냄
+                    self.messages.pop(slot, None)
+                    print(f"현황 메시지 수정 오류 ({key}, {chat_id}): {e}")
+                    return
+                except TelegramError as e:
+                    print(f"현황 메시지 전송 오류 ({key}, {chat_id}): {e}")
+                    return
+
+    async def finish(self, bot, key, chat_id):
+        if key in self.finished:
+            return
+        self.finished.add(key)
+        # 이 이벤트의 현황 메시지가 있는 모든 채팅 (전체 이벤트는 여러 채팅)
+        chats = list(dict.fromkeys([c for k, c in list(self.messages) + list(self.tasks) if k == key] + [chat_id]))
+        for chat in chats:
+            task = self.tasks.pop((key, chat), None)
+            if task:
+                task.cancel()
+        event = store.event(key)
+        for chat in chats:
+            await self._publish(bot, key, chat, lambda: render_status(event, final=True), final=True)
+            for chunk in render_summary(event):
+                try:
+                    await bot.send_message(chat_id=chat, text=chunk)
+                except TelegramError as e:
+                    print(f"최종 명단 전송 오류 ({key}, {chat}): {e}")
+
+    def reopen(self, key):
+        # 마감 뒤 인원을 늘리면 다시 현황을 올리고 새 마감을 알림
+        self.finished.discard(key)
+
+    def forget(self, key):
+        # 이벤트를 새로 시작하거나 초기화할 때 현황 상태 비우기
+        for slot in [s for s in list(self.messages) + list(self.tasks) if s[0] == key]:
+            task = self.tasks.pop(slot, None)
+            if task:
+                task.cancel()
+            self.messages.pop(slot, None)
+            self.last_edit.pop(slot, None)
+            self.locks.pop(slot, None)
+        self.finished.discard(key)
+
+announcer = EventAnnouncer()
 
 # 관리자 확인
 def is_admin(user_id: int) -> bool:
     return user_id in ADMIN_IDS
 
+# 조회 명령(/list5, /status5)이 볼 이벤트: 채팅 전용 이벤트가 없으면 전체("*") 이벤트
+def event_key(chat_id):
+    key = str(chat_id)
+    if key not in store.events and WILDCARD in store.events:
+        return WILDCARD
+    return key
+
+# 설정 명령이 바꿀 이벤트: 첫 인자가 "*" 이면 전체 이벤트, 아니면 명령을 보낸 채팅의 이벤트
+def target_key(chat_id, args):
+    if args and args[0] == WILDCARD:
+        return WILDCARD, args[1:]
+    return str(chat_id), args
+
+def scope_label(key):
+    return "전체 채팅" if key == WILDCARD else "이 채팅"
+
 # 명령어 핸들러들
 async def start5(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text("이모지 선착순 이벤트 봇입니다.\n관리자는 /setemoji5, /setlimit5, /startevent5 명령으로 설정 후 시작하세요.")
+    await update.message.reply_text("이모지 선착순 이벤트 봇입니다.\n관리자는 이벤트를 열 채팅에서 /setemoji5, /setlimit5, /startevent5 명령으로 설정 후 시작하세요.\n모든 채팅에 적용할 이벤트는 명령 뒤에 * 를 붙입니다 (예: /setemoji5 * 🎉, /reset5 *).\n/events5 로 진행 중인 이벤트를 볼 수 있습니다.")
 
 async def setemoji(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_admin(update.effective_user.id):
         return
-    if context.args:
-        event_data["emoji_to_track"] = context.args[0]
+    # 여러 개 지정 가능: /setemoji5 🎉 🔥 또는 /setemoji5 🎉🔥
+    key, args = target_key(update.effective_chat.id, context.args)
+    emojis = list(dict.fromkeys(g for arg in args for g in graphemes(arg) if not g.isspace()))
+    if emojis:
+        store.ensure(key)["emojis"] = emojis
         save_event_data()
-        await update.message.reply_text(f"감지할 이모지가 '{event_data['emoji_to_track']}'로 설정되었습니다.")
+        sync_matcher(key)
+        await update.message.reply_text(f"[{scope_label(key)}] 감지할 이모지가 '{' '.join(emojis)}'로 설정되었습니다.")
 
 async def setlimit(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_admin(update.effective_user.id):
         return
     try:
-        limit = int(context.args[0])
-        event_data["participant_limit"] = limit
+        key, args = target_key(update.effective_chat.id, context.args)
+        limit = int(args[0])
+        store.ensure(key)["participant_limit"] = limit
         save_event_data()
-        await update.message.reply_text(f"선착순 인원이 {limit}명으로 설정되었습니다.")
+        announcer.reopen(key)
+        await update.message.reply_text(f"[{scope_label(key)}] 선착순 인원이 {limit}명으로 설정되었습니다.")
     except:
         await update.message.reply_text("❗ 숫자를 정확히 입력해주세요.")
 
 async def start_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_admin(update.effective_user.id):
         return
-    load_event_data()  # ✅ 상태 최신화
-    if not event_data["emoji_to_track"] or not event_data["participant_limit"]:
+    key, _ = target_key(update.effective_chat.id, context.args)
+    event = store.event(key)
+    if not event or not event["emojis"] or not event["participant_limit"]:
         await update.message.reply_text("이모지와 인원 수를 먼저 설정하세요.")
         return
-    event_data["event_started"] = True
+    event["event_started"] = True
     save_event_data()
-    await update.message.reply_text("✅ 이벤트가 시작되었습니다! 설정된 이모지를 포함해 메시지를 보내면 참여됩니다.")
+    sync_matcher(key)
+    announcer.forget(key)
+    await update.message.reply_text(f"✅ [{scope_label(key)}] 이벤트가 시작되었습니다! 설정된 이모지를 포함해 메시지를 보내면 참여됩니다.")
 
 async def reset5(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_admin(update.effective_user.id):
         return
-    event_data.update({
-        "emoji_to_track": None,
-        "participant_limit": None,
-        "participants": [],
-        "event_started": False
-    })
-    save_event_data()
-    await update.message.reply_text("🔁 이벤트가 초기화되었습니다.")
+    key, _ = target_key(update.effective_chat.id, context.args)
+    store.remove(key)
+    sync_matcher(key)
+    announcer.forget(key)
+    await update.message.reply_text(f"🔁 [{scope_label(key)}] 이벤트가 초기화되었습니다.")
 
 async def list5(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not event_data["participants"]:
+    event = store.event(event_key(update.effective_chat.id))
+    if not event or not event["participants"]:
         await update.message.reply_text("아직 참여자가 없습니다.")
         return
-    lines = [f"{i+1}. {p['name']}" for i, p in enumerate(event_data["participants"])]
+    lines = [f"{i+1}. {p['name']}" for i, p in enumerate(event["participants"])]
     await update.message.reply_text("👥 현재 참여자 목록:\n" + "\n".join(lines))
 
 async def status5(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if event_data["emoji_to_track"] and event_data["participant_limit"]:
+    event = store.event(event_key(update.effective_chat.id))
+    if event and event["emojis"] and event["participant_limit"]:
         await update.message.reply_text(
             f"""📊 현재 이벤트 상태:
-- 감지 이모지: {event_data['emoji_to_track']}
-- 인원 제한: {event_data['participant_limit']}
-- 현재 참여자 수: {len(event_data['participants'])}
-- 이벤트 시작됨: {event_data['event_started']}"""
+- 감지 이모지: {' '.join(event['emojis'])}
+- 인원 제한: {event['participant_limit']}
+- 현재 참여자 수: {len(event['participants'])}
+- 이벤트 시작됨: {event['event_started']}"""
         )
     else:
         await update.message.reply_text("❗ 아직 이모지나 인원 수가 설정되지 않았습니다.")
 
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not event_data["event_started"] or not event_data["emoji_to_track"]:
+async def events5(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update.effective_user.id):
+        return
+    if not store.events:
+        await update.message.reply_text("등록된 이벤트가 없습니다.")
         return
+    lines = ["🗂️ 이벤트 목록:"]
+    for key, event in store.events.items():
+        where = "전체 채팅" if key == WILDCARD else key
+        state = "진행 중" if event["event_started"] else "대기"
+        lines.append(f"- {where}: {' '.join(event['emojis']) or '-'} ({len(event['participants'])}/{event['participant_limit'] or '-'}, {state})")
+    await update.message.reply_text("\n".join(lines))
 
+async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text
     user_id = update.effective_user.id
 
-    if event_data["emoji_to_track"] not in text:
+    # 진행 중인 모든 이벤트의 이모지를 한 번에 검사
+    keys = matcher.match(text)
+    if not keys:
         return
-
-    if user_id in [p["id"] for p in event_data["participants"]]:
+    chat_key = str(update.effective_chat.id)
+    key = chat_key if chat_key in keys else WILDCARD if WILDCARD in keys else None
+    if key is None:
         return
+    event = store.event(key)
 
-    if len(event_data["participants"]) >= event_data["participant_limit"]:
-        await update.message.reply_text("😥 이벤트가 마감되었습니다.")
-        return
-
-    event_data["participants"].append({
-        "id": user_id,
-        "name": update.effective_user.full_name
-    })
-    save_event_data()
+    # 확인과 추가 사이에 await 가 없어 동시에 처리돼도 인원을 넘지 않음
+    with blocking_io("event_journal"):
+        result, count = store.admit(key, user_id, update.effective_user.full_name)
+    if result != "joined":
+        return  # 중복 참여와 마감 후 메시지에는 답하지 않음
 
-    count = len(event_data["participants"])
-    if count == event_data["participant_limit"]:
-        await update.message.reply_text(f"{update.effective_user.full_name}님이 마지막 참여자입니다! ({count}/{event_data['participant_limit']})")
+    # 개별 답장 대신 현황 메시지를 모아서 수정
+    if count == event["participant_limit"]:
+        await announcer.finish(context.bot, key, update.effective_chat.id)
     else:
-        await update.message.reply_text(f"{update.effective_user.full_name}님이 참여하셨습니다! ({count}/{event_data['participant_limit']})")
+        announcer.notify(context.bot, key, update.effective_chat.id)
 
-# 메인
-async def main():
+# 앱 구성
+def build_app(builder=None):
     load_event_data()
-    app = ApplicationBuilder().token(TOKEN).build()
+    app = (builder or ApplicationBuilder()).token(TOKEN).build()
 
     app.add_handler(CommandHandler("start5", start5))
     app.add_handler(CommandHandler("setemoji5", setemoji))
@@ -142,8 +322,13 @@ async def main():
     app.add_handler(CommandHandler("reset5", reset5))
     app.add_handler(CommandHandler("list5", list5))
     app.add_handler(CommandHandler("status5", status5))
+    app.add_handler(CommandHandler("events5", events5))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    return instrument(app, "bot5")
 
+# 메인
+async def main():
+    app = build_app()
     print("✅ bot5_emoji_event.py is running...")
     await app.run_polling()
 
@@ -0,0 +1,101 @@
+import time
+import asyncio
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+from rate_limit import KeyedRateLimiter, TokenBucket
+
+# ---------- 대량 전송 ----------
+# 텔레그램 권장 한도: 전체 초당 약 30건, 그룹은 분당 20건, 개인 채팅은 초당 1건
+GLOBAL_RATE = 30.0
+GROUP_RATE = 20 / 60
+PRIVATE_RATE = 1.0
+
+def is_group_chat(chat_id):
+    # 음수 ID 와 "@채널이름" 처럼 숫자가 아닌 ID 는 그룹/채널 (개인 채팅은 항상 양수 ID)
+    try:
+        return int(chat_id) < 0
+    except (TypeError, ValueError):
+        return True
+
+class BroadcastDispatcher:
+    """여러 채팅에 같은 메시지를 동시에 보내되 전체/채팅별 토큰 버킷으로 속도를 맞춘다.
+
+    RetryAfter 를 받으면 해당 채팅과 전체 버킷을 그 시간만큼 멈춘 뒤 다시 보낸다.
+    네트워크 오류/타임아웃은 지수 백오프로 max_retries 번까지 재시도하고,
+    봇이 차단됐거나 잘못된 채팅(Forbidden, BadRequest)은 바로 실패로 센다.
+    """
+
+    def __init__(self, bot, global_rate=GLOBAL_RATE, group_rate=GROUP_RATE, private_rate=PRIVATE_RATE,
+                 concurrency=64, max_retries=3, max_chats=100_000, retry_delay=1.0):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.group_limiter = KeyedRateLimiter(group_rate, 1, max_chats)
+        self.private_limiter = KeyedRateLimiter(private_rate, 1, max_chats)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay  # 네트워크 오류 첫 재시도 대기(초), 이후 두 배씩
+
+    def _chat_bucket(self, chat_id):
+        limiter = self.group_limiter if is_group_chat(chat_id) else self.private_limiter
+        return limiter.bucket(chat_id)
+
+    async def _acquire(self, chat_id):
+        # 채팅 버킷과 전체 버킷 모두 토큰이 있을 때 함께 가져감 (확인과 차감 사이에 await 없음)
+        while True:
+            now = time.monotonic()
+            chat_bucket = self._chat_bucket(chat_id)
+            wait = chat_bucket.wait_time(now=now) or self.global_bucket.wait_time(now=now)
+            if wait <= 0:
+                chat_bucket.take(now=now)
+                self.global_bucket.take(now=now)
+                return
+            await asyncio.sleep(wait)
+
+    async def send(self, chat_id, text, stats, **kwargs):
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id)
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                stats["sent"] += 1
+                return True
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if hasattr(retry_after, "total_seconds"):
+                    retry_after = retry_after.total_seconds()
+                stats["retry_after"] += 1
+                now = time.monotonic()
+                self._chat_bucket(chat_id).pause(retry_after, now)
+                self.global_bucket.pause(retry_after, now)
+            except (Forbidden, BadRequest) as e:
+                stats["failed"] += 1
+                stats["errors"][str(chat_id)] = str(e)
+                return False
+            except NetworkError as e:
+                if attempt == self.max_retries:
+                    stats["failed"] += 1
+                    stats["errors"][str(chat_id)] = str(e)
+                    return False
+                stats["retried"] += 1
+                await asyncio.sleep(delay)
+                delay *= 2
+            except TelegramError as e:
+                stats["failed"] += 1
+                stats["errors"][str(chat_id)] = str(e)
+                return False
+        stats["failed"] += 1
+        stats["errors"][str(chat_id)] = "재시도 횟수 초과"
+        return False
+
+    async def broadcast(self, chat_ids, text, **kwargs):
+        # 전송 결과 통계를 반환 {"total", "sent", "failed", "retried", "retry_after", "elapsed", "errors"}
+        stats = {"total": len(chat_ids), "sent": 0, "failed": 0, "retried": 0, "retry_after": 0, "errors": {}}
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(chat_id):
+            async with semaphore:
+                await self.send(chat_id, text, stats, **kwargs)
+
+        await asyncio.gather(*[one(chat_id) for chat_id in chat_ids])
+        stats["elapsed"] = round(time.monotonic() - started, 3)
+        return stats
@@ -0,0 +1,408 @@
+import time
+import queue
+import sqlite3
+import datetime
+import threading
+from collections import OrderedDict
+
+# ---------- 스키마 ----------
+CLICKS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS clicks (
+        vid TEXT,
+        uid TEXT,
+        ip TEXT,
+        date TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(vid, uid, ip, date)
+    )
+'''
+CLICKS_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_clicks_date ON clicks(date)",
+]
+
+# 집계 테이블: 클릭이 INSERT 될 때 트리거로 함께 증가
+COUNTER_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS click_counts (
+        uid TEXT PRIMARY KEY,
+        cnt INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_click_counts_cnt ON click_counts(cnt DESC)",
+    '''
+    CREATE TABLE IF NOT EXISTS click_counts_video (
+        uid TEXT,
+        vid TEXT,
+        cnt INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (uid, vid)
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_click_counts_video_vid ON click_counts_video(vid)",
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_clicks_count AFTER INSERT ON clicks
+    BEGIN
+        INSERT INTO click_counts (uid, cnt) VALUES (NEW.uid, 1)
+            ON CONFLICT(uid) DO UPDATE SET cnt = cnt + 1;
+        INSERT INTO click_counts_video (uid, vid, cnt) VALUES (NEW.uid, NEW.vid, 1)
+            ON CONFLICT(uid, vid) DO UPDATE SET cnt = cnt + 1;
+    END
+    ''',
+]
+
+# 보관 기간이 지난 원본 클릭을 날짜별로 합친 테이블
+ROLLUP_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS click_daily (
+        vid TEXT,
+        uid TEXT,
+        date TEXT,
+        cnt INTEGER NOT NULL,
+        PRIMARY KEY (vid, uid, date)
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_click_daily_uid ON click_daily(uid)",
+]
+
+def connect(db_path, durable=False):
+    # WAL 모드: 읽기(bot 통계)가 쓰기를 막지 않음
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=FULL" if durable else "PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+def init_click_db(conn):
+    # 삭제된 공간을 조금씩 돌려받을 수 있도록 incremental auto_vacuum 사용
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # 이미 만들어진 DB (WAL 로 바꾼 빈 DB 포함) 는 VACUUM 을 해야 적용됨
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            if conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone() is not None:
+                print("🧹 clicks.db 를 incremental vacuum 모드로 한 번 변환합니다 (VACUUM)")
+            conn.execute("VACUUM")
+    has_counters = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'click_counts'"
+    ).fetchone() is not None
+    conn.execute(CLICKS_SCHEMA)
+    for sql in CLICKS_INDEXES + COUNTER_SCHEMA + ROLLUP_SCHEMA:
+        conn.execute(sql)
+    conn.commit()
+    # 집계 테이블이 처음 생긴 기존 DB 는 원본 클릭으로 채움
+    if not has_counters:
+        rebuild_counters(conn)
+
+# ---------- 집계 ----------
+# 날짜별 집계(click_daily)와 아직 남아 있는 원본 클릭을 합친 전체 클릭
+ALL_CLICKS = "SELECT vid, uid, cnt FROM click_daily UNION ALL SELECT vid, uid, 1 FROM clicks"
+
+def rebuild_counters(conn):
+    with conn:
+        conn.execute("DELETE FROM click_counts")
+        conn.execute("DELETE FROM click_counts_video")
+        conn.execute(f"INSERT INTO click_counts (uid, cnt) SELECT uid, SUM(cnt) FROM ({ALL_CLICKS}) GROUP BY uid")
+        conn.execute(
+            "INSERT INTO click_counts_video (uid, vid, cnt) "
+            f"SELECT uid, vid, SUM(cnt) FROM ({ALL_CLICKS}) GROUP BY uid, vid"
+        )
+
+def reset_clicks(conn):
+    with conn:
+        conn.execute("DELETE FROM clicks")
+        conn.execute("DELETE FROM click_daily")
+        conn.execute("DELETE FROM click_counts")
+        conn.execute("DELETE FROM click_counts_video")
+
+def uid_count(conn, uid):
+    row = conn.execute("SELECT cnt FROM click_counts WHERE uid = ?", (uid,)).fetchone()
+    return row[0] if row else 0
+
+def top_uids(conn, limit):
+    return conn.execute(
+        "SELECT uid, cnt FROM click_counts ORDER BY cnt DESC LIMIT ?", (limit,)
+    ).fetchall()
+
+# 여러 키를 한 번에 조회 (SQLite 변수 개수 제한에 맞춰 나눠서 IN 조회)
+def _counts_in(conn, sql, keys, chunk=500):
+    counts = {}
+    keys = list(dict.fromkeys(keys))
+    for i in range(0, len(keys), chunk):
+        part = keys[i:i + chunk]
+        counts.update(conn.execute(sql.format(",".join("?" * len(part))), part).fetchall())
+    return counts
+
+def uid_counts(conn, uids):
+    return _counts_in(conn, "SELECT uid, cnt FROM click_counts WHERE uid IN ({})", uids)
+
+def vid_counts(conn, vids):
+    return _counts_in(conn, "SELECT vid, SUM(cnt) FROM click_counts_video WHERE vid IN ({}) GROUP BY vid", vids)
+
+# ---------- 보관 기간 / 압축 ----------
+class ClickRetention:
+    """retention_days 보다 오래된 원본 클릭을 click_daily 로 합치고 지운 뒤 공간을 회수한다.
+
+    step() 한 번은 가장 오래된 날짜의 원본 클릭을 rollup_rows 건까지 합치거나, vacuum_pages 만큼 비우거나, WAL 체크포인트를
+    하는 짧은 작업이라 기록기 스레드가 클릭 커밋 사이사이에 실행해도 삽입이 오래 막히지 않는다.
+    집계 테이블(click_counts*)은 누적값이라 원본을 지워도 그대로 유지된다.
+    """
+
+    def __init__(self, retention_days, vacuum_pages=256, rollup_rows=2000):
+        self.retention_days = retention_days
+        self.vacuum_pages = vacuum_pages
+        self.rollup_rows = rollup_rows
+
+    def cutoff(self):
+        today = datetime.datetime.utcnow().date()
+        return (today - datetime.timedelta(days=self.retention_days)).isoformat()
+
+    def rollup_chunk(self, conn, date):
+        # 그 날짜의 클릭을 rowid 순으로 rollup_rows 건만 합치고 지움 (한 트랜잭션이 짧게 끝나도록)
+        with conn:
+            last = conn.execute(
+                "SELECT MAX(rowid) FROM (SELECT rowid FROM clicks WHERE date = ? ORDER BY rowid LIMIT ?)",
+                (date, self.rollup_rows)
+            ).fetchone()[0]
+            if last is None:
+                return
+            conn.execute(
+                "INSERT INTO click_daily (vid, uid, date, cnt) "
+                "SELECT vid, uid, date, COUNT(*) FROM clicks WHERE date = ? AND rowid <= ? GROUP BY vid, uid "
+                "ON CONFLICT(vid, uid, date) DO UPDATE SET cnt = cnt + excluded.cnt",
+                (date, last)
+            )
+            conn.execute("DELETE FROM clicks WHERE date = ? AND rowid <= ?", (date, last))
+
+    def step(self, conn):
+        # 할 일이 더 남았으면 True
+        row = conn.execute(
+            "SELECT MIN(date) FROM clicks WHERE date < ?", (self.cutoff(),)
+        ).fetchone()
+        if row[0] is not None:
+            self.rollup_chunk(conn, row[0])
+            return True
+        if conn.execute("PRAGMA freelist_count").fetchone()[0] > 0 and conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            # execute() 는 한 단계(한 페이지)만 실행하므로 끝까지 실행되는 executescript 사용
+            conn.executescript(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)});")
+            return True
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return False
+
+# ---------- 중복 클릭 필터 ----------
+class RecentClicks:
+    """오늘 이미 기록된 (vid, uid, ip, date) 키를 최대 max_entries 개까지 기억하는 LRU.
+
+    여기 있으면 DB 에도 있으므로 바로 "duplicate" 로 응답할 수 있다.
+    없다고 해서 새 클릭이라는 뜻은 아니며, 최종 판단은 DB 의 UNIQUE 제약이 한다.
+    날짜가 바뀌면 비운다.
+    """
+
+    def __init__(self, max_entries=100_000):
+        self.max_entries = max_entries
+        self._date = None
+        self._keys = OrderedDict()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _rotate(self, date):
+        if date != self._date:
+            self._keys.clear()
+            self._date = date
+
+    def seen(self, vid, uid, ip, date):
+        if date != self._date:
+            return False
+        key = (vid, uid, ip)
+        if key not in self._keys:
+            return False
+        self._keys.move_to_end(key)
+        return True
+
+    def add(self, vid, uid, ip, date):
+        if self.max_entries <= 0:
+            return
+        self._rotate(date)
+        self._keys[(vid, uid, ip)] = None
+        self._keys.move_to_end((vid, uid, ip))
+        while len(self._keys) > self.max_entries:
+            self._keys.popitem(last=False)
+
+    def clear(self):
+        self._keys.clear()
+
+    def load_day(self, conn, date):
+        # 시작 시 오늘 기록된 클릭으로 다시 채움 (최근 것 우선)
+        self._rotate(date)
+        if self.max_entries <= 0:
+            return
+        rows = conn.execute(
+            "SELECT vid, uid, ip FROM clicks WHERE date = ? ORDER BY rowid DESC LIMIT ?",
+            (date, self.max_entries)
+        ).fetchall()
+        for vid, uid, ip in reversed(rows):
+            self._keys[(vid, uid, ip)] = None
+
+# ---------- 클릭 기록기 (group commit) ----------
+_STOP = object()
+
+class _Call:
+    # 기록기 스레드에서 클릭 사이 순서대로 실행할 DB 작업 (초기화, 집계 재계산 등)
+    def __init__(self, fn, loop, fut):
+        self.fn = fn
+        self.loop = loop
+        self.fut = fut
+
+def _resolve(fut, status, error=None):
+    if fut.done():
+        return
+    if error is not None:
+        fut.set_exception(error)
+    else:
+        fut.set_result(status)
+
+class ClickWriter:
+    """백그라운드 스레드 하나가 DB 연결을 소유하고, 큐에 쌓인 클릭을 묶어서 커밋한다.
+
+    mode="batch": 최대 batch_size 건 또는 batch_ms 밀리초 단위로 한 번에 커밋
+    mode="durable": 클릭마다 커밋 (synchronous=FULL)
+    on_commit(seconds, rows) 가 주어지면 커밋마다 걸린 시간을 알려준다.
+    maintenance 객체(step(conn) -> 남은 작업 여부)가 주어지면 큐가 비었을 때
+    maintenance_interval 초마다, 남은 작업이 있으면 바로 이어서 실행한다.
+    """
+
+    def __init__(self, db_path, mode="batch", batch_size=256, batch_ms=5.0, on_commit=None,
+                 maintenance=None, maintenance_interval=600):
+        if mode not in ("batch", "durable"):
+            # 오타가 조용히 batch 로 동작하지 않도록 시작할 때 막음
+            raise ValueError(f"알 수 없는 클릭 커밋 방식: {mode!r} (batch 또는 durable)")
+        self.db_path = db_path
+        self.on_commit = on_commit
+        self.maintenance = maintenance
+        self.maintenance_interval = maintenance_interval
+        self.mode = mode
+        self.batch_size = max(1, batch_size) if mode == "batch" else 1
+        self.batch_wait = max(0.0, batch_ms) / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="click-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        # 종료 표시는 큐 맨 뒤에 들어가므로 그 앞의 클릭은 모두 커밋된 뒤 종료됨
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def submit(self, loop, vid, uid, ip, date):
+        # 결과("counted" / "duplicate")는 반환된 future로 전달됨
+        fut = loop.create_future()
+        self.start()
+        self._queue.put((vid, uid, ip, date, loop, fut))
+        return fut
+
+    def call(self, loop, fn):
+        # fn(conn) 을 앞서 들어온 클릭이 커밋된 뒤 기록기 스레드에서 실행하고 결과를 future로 전달
+        fut = loop.create_future()
+        self.start()
+        self._queue.put(_Call(fn, loop, fut))
+        return fut
+
+    def _run(self):
+        conn = connect(self.db_path, durable=self.mode == "durable")
+        next_maintenance = time.monotonic()
+        try:
+            stopping = False
+            while not stopping:
+                if self.maintenance is None:
+                    item = self._queue.get()
+                else:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, next_maintenance - time.monotonic()))
+                    except queue.Empty:
+                        next_maintenance = time.monotonic() + self._run_maintenance(conn)
+                        continue
+                if item is _STOP:
+                    break
+                if isinstance(item, _Call):
+                    self._call(conn, item)
+                    continue
+                batch = [item]
+                call = None
+                deadline = time.monotonic() + self.batch_wait
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        if remaining > 0:
+                            item = self._queue.get(timeout=remaining)
+                        else:
+                            item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    if isinstance(item, _Call):
+                        call = item
+                        break
+                    batch.append(item)
+                self._commit(conn, batch)
+                if call is not None:
+                    self._call(conn, call)
+                # 클릭이 끊이지 않아도 정리 작업이 밀리지 않도록 커밋 뒤에도 확인
+                if self.maintenance is not None and time.monotonic() >= next_maintenance:
+                    next_maintenance = time.monotonic() + self._run_maintenance(conn)
+        finally:
+            conn.close()
+
+    def _run_maintenance(self, conn):
+        # 다음 실행까지 기다릴 시간(초)을 반환
+        try:
+            more = self.maintenance.step(conn)
+        except Exception as e:
+            print(f"❌ [ClickWriter] 정리 작업 실패: {e}")
+            return self.maintenance_interval
+        return 0.0 if more else self.maintenance_interval
+
+    def _call(self, conn, call):
+        result, error = None, None
+        try:
+            result = call.fn(conn)
+        except Exception as e:
+            print(f"❌ [ClickWriter] 작업 실패: {e}")
+            error = e
+        try:
+            call.loop.call_soon_threadsafe(_resolve, call.fut, result, error)
+        except RuntimeError:
+            pass
+
+    def _commit(self, conn, batch):
+        results = []
+        error = None
+        started = time.perf_counter()
+        try:
+            with conn:
+                for vid, uid, ip, date, _, _ in batch:
+                    cur = conn.execute(
+                        "INSERT OR IGNORE INTO clicks (vid, uid, ip, date) VALUES (?, ?, ?, ?)",
+                        (vid, uid, ip, date)
+                    )
+                    results.append("counted" if cur.rowcount == 1 else "duplicate")
+        except Exception as e:
+            print(f"❌ [ClickWriter] 커밋 실패 ({len(batch)}건): {e}")
+            error = e
+        if self.on_commit is not None:
+            self.on_commit(time.perf_counter() - started, len(batch))
+        for i, (_, _, _, _, loop, fut) in enumerate(batch):
+            status = results[i] if error is None else None
+            try:
+                loop.call_soon_threadsafe(_resolve, fut, status, error)
+            except RuntimeError:
+                pass  # 이벤트 루프가 이미 닫힘
@@ -0,0 +1,50 @@
+import hashlib
+
+# ---------- 추천 코드 할당 ----------
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+class CodeAllocator:
+    """순번(counter)을 키가 있는 순열로 섞어 base36 코드로 바꾼다.
+
+    순열이라 서로 다른 순번은 항상 서로 다른 코드가 되므로 중복 확인이나 재시도가 필요 없다.
+    32비트 Feistel 네트워크를 36^length 범위 안으로 cycle-walking 해서 쓰고,
+    키를 모르면 연속된 순번의 코드도 무작위처럼 보인다.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, key, length=6):
+        key = key if isinstance(key, bytes) else key.encode()
+        # blake2b 키는 최대 64바이트
+        self.key = key if len(key) <= 64 else hashlib.sha256(key).digest()
+        self.length = length
+        self.domain = len(ALPHABET) ** length
+        self.half_bits = max(8, ((self.domain - 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+
+    def _round(self, i, value):
+        digest = hashlib.blake2b(bytes([i]) + value.to_bytes(8, "big"), key=self.key, digest_size=8).digest()
+        return int.from_bytes(digest, "big") & self.half_mask
+
+    def _feistel(self, n):
+        left, right = n >> self.half_bits, n & self.half_mask
+        for i in range(self.ROUNDS):
+            left, right = right, left ^ self._round(i, right)
+        return (left << self.half_bits) | right
+
+    def permute(self, n):
+        # [0, domain) 안의 값이 나올 때까지 반복 (domain 이 2^(2*half_bits) 의 절반 이상이라 평균 2회 미만)
+        if not 0 <= n < self.domain:
+            raise ValueError("코드 공간을 모두 사용했습니다.")
+        n = self._feistel(n)
+        while n >= self.domain:
+            n = self._feistel(n)
+        return n
+
+    def encode(self, n):
+        value = self.permute(n)
+        chars = []
+        for _ in range(self.length):
+            value, r = divmod(value, len(ALPHABET))
+            chars.append(ALPHABET[r])
+        return "".join(reversed(chars))
@@ -0,0 +1,142 @@
+import unicodedata
+from collections import deque
+
+# ---------- 그래핌 클러스터 ----------
+ZWJ = "\u200d"
+VARIATION_SELECTORS = {"\ufe0e", "\ufe0f"}
+
+def _is_extender(ch):
+    cp = ord(ch)
+    return (
+        ch in VARIATION_SELECTORS
+        or 0x1F3FB <= cp <= 0x1F3FF      # 피부색
+        or 0xE0020 <= cp <= 0xE007F      # 태그 (지역 깃발)
+        or unicodedata.category(ch) in ("Mn", "Me")  # 결합 문자, 키캡(20E3)
+    )
+
+def _is_regional(ch):
+    return 0x1F1E6 <= ord(ch) <= 0x1F1FF
+
+def graphemes(text):
+    # 이모지용 단순화 그래핌 분리: ZWJ 시퀀스, 피부색/이체자/키캡/태그, 국기(지역 표시 2개)를 한 덩어리로
+    clusters = []
+    i, n = 0, len(text)
+    while i < n:
+        j = i + 1
+        if _is_regional(text[i]) and j < n and _is_regional(text[j]):
+            j += 1
+        while j < n:
+            ch = text[j]
+            if _is_extender(ch):
+                j += 1
+            elif ch == ZWJ:
+                j += 2 if j + 1 < n else 1
+            else:
+                break
+        clusters.append(text[i:j])
+        i = j
+    return clusters
+
+def cluster_key(cluster):
+    # ❤ 와 ❤️ 처럼 이체자 선택자만 다른 것은 같은 이모지로 봄
+    return "".join(ch for ch in cluster if ch not in VARIATION_SELECTORS)
+
+def tokenize(text):
+    return [cluster_key(c) for c in graphemes(text)]
+
+# ---------- 다중 패턴 매칭 ----------
+class _Node:
+    __slots__ = ("next", "fail", "outputs", "matches")
+
+    def __init__(self):
+        self.next = {}
+        self.fail = None
+        self.outputs = {}    # 이 노드에서 끝나는 패턴의 key → 등록 횟수
+        self.matches = ()    # fail 링크를 따라 모은 key 들
+
+class EmojiMatcher:
+    """여러 (key, 패턴) 을 그래핌 클러스터 단위 Aho-Corasick 오토마톤으로 찾는다.
+
+    패턴은 클러스터 경계에서만 맞으므로 👍 는 👍🏽 나 👨‍👩‍👧 안의 👨 에 걸리지 않는다.
+    추가/삭제는 트라이만 고치고 dirty 표시를 하며, fail 링크는 다음 match() 때 한 번만 다시 계산한다.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self._first_chars = frozenset()
+        self._dirty = False
+
+    def add(self, key, pattern):
+        tokens = tokenize(pattern)
+        if not tokens:
+            return
+        node = self.root
+        for token in tokens:
+            node = node.next.setdefault(token, _Node())
+        node.outputs[key] = node.outputs.get(key, 0) + 1
+        self._dirty = True
+
+    def remove(self, key, pattern):
+        tokens = tokenize(pattern)
+        path = [self.root]
+        for token in tokens:
+            node = path[-1].next.get(token)
+            if node is None:
+                return
+            path.append(node)
+        node = path[-1]
+        if key not in node.outputs:
+            return
+        node.outputs[key] -= 1
+        if node.outputs[key] <= 0:
+            del node.outputs[key]
+        # 더 이상 쓰이지 않는 가지 잘라내기
+        for depth in range(len(tokens), 0, -1):
+            child = path[depth]
+            if child.outputs or child.next:
+                break
+            del path[depth - 1].next[tokens[depth - 1]]
+        self._dirty = True
+
+    def remove_key(self, key, patterns):
+        for pattern in patterns:
+            self.remove(key, pattern)
+
+    def _build(self):
+        root = self.root
+        root.fail = root
+        root.matches = tuple(root.outputs)
+        queue = deque()
+        for child in root.next.values():
+            child.fail = root
+            child.matches = tuple(child.outputs)
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for token, child in node.next.items():
+                fail = node.fail
+                while fail is not root and token not in fail.next:
+                    fail = fail.fail
+                child.fail = fail.next.get(token, root)
+                child.matches = tuple(child.outputs) + child.fail.matches
+                queue.append(child)
+        # 패턴 첫 글자가 하나도 없는 메시지(대부분)는 클러스터 분리 없이 건너뜀
+        self._first_chars = frozenset(token[0] for token in root.next)
+        self._dirty = False
+
+    def match(self, text):
+        # 텍스트를 한 번 훑어 걸린 key 집합 반환
+        if self._dirty:
+            self._build()
+        root = self.root
+        if self._first_chars.isdisjoint(text):
+            return set()
+        found = set()
+        node = root
+        for token in tokenize(text):
+            while node is not root and token not in node.next:
+                node = node.fail
+            node = node.next.get(token, root)
+            if node.matches:
+                found.update(node.matches)
+        return found
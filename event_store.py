@@ -0,0 +1,135 @@
+import os
+import json
+
+# ---------- 이벤트 상태 저장 ----------
+WILDCARD = "*"  # 모든 채팅에 적용되는 이벤트 (예전 단일 이벤트)
+
+def default_event():
+    return {
+        "emojis": [],
+        "participant_limit": None,
+        "participants": [],
+        "event_started": False
+    }
+
+def is_blank(event):
+    return event == default_event()
+
+def migrate_legacy(data):
+    # 예전 단일 이벤트 {"emoji_to_track", ...} → {"events": {"*": {...}}}
+    # 설정된 적 없는 빈 이벤트는 옮기지 않음 (빈 "*" 가 있으면 모든 채팅 명령이 그쪽으로 감)
+    if "events" in data:
+        events = data["events"]
+        if WILDCARD in events and is_blank(events[WILDCARD]):
+            del events[WILDCARD]
+        return data
+    event = default_event()
+    if data.get("emoji_to_track"):
+        event["emojis"] = [data["emoji_to_track"]]
+    event["participant_limit"] = data.get("participant_limit")
+    event["participants"] = data.get("participants", [])
+    event["event_started"] = data.get("event_started", False)
+    return {"events": {} if is_blank(event) else {WILDCARD: event}}
+
+class EventStore:
+    """채팅별 선착순 이벤트 상태를 스냅샷(JSON) + 추가 전용 저널(JSONL)로 저장한다.
+
+    참여는 저널에 한 줄만 덧붙이고, 저널이 compact_every 줄을 넘으면 스냅샷을 다시 쓰고 비운다.
+    참여자 ID 는 이벤트별 set 으로 따로 들고 있어 중복 확인이 O(1) 이다.
+    admit() 안에는 await 가 없으므로 업데이트를 동시에 처리해도 순서대로 들어가고 인원을 넘지 않는다.
+    """
+
+    def __init__(self, path, compact_every=500):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_every = compact_every
+        self.data = {"events": {}}
+        self.ids = {}
+        self._journal = None
+        self._journal_lines = 0
+
+    @property
+    def events(self):
+        return self.data["events"]
+
+    def load(self):
+        data = {"events": {}}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                data = migrate_legacy(json.load(f))
+        self.data = data
+        self.ids = {key: {p["id"] for p in event["participants"]} for key, event in self.events.items()}
+        self._journal_lines = 0
+        torn = False
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        torn = True  # 마지막 줄이 쓰다 만 경우
+                        break
+                    self._journal_lines += 1
+                    self._apply(entry)
+        if torn:
+            # 잘린 줄 뒤에 이어 쓰지 않도록 바로 스냅샷으로 정리
+            self.save()
+        return self.data
+
+    def event(self, key):
+        return self.events.get(key)
+
+    def ensure(self, key):
+        event = self.events.get(key)
+        if event is None:
+            event = self.events[key] = default_event()
+            self.ids[key] = set()
+        return event
+
+    def _apply(self, entry):
+        key = entry.get("event", WILDCARD)
+        event = self.events.get(key)
+        ids = self.ids.get(key)
+        if entry.get("op") == "join" and event is not None and entry["id"] not in ids:
+            ids.add(entry["id"])
+            event["participants"].append({"id": entry["id"], "name": entry["name"]})
+
+    def admit(self, key, user_id, name):
+        # "duplicate" | "full" | "joined" 와 현재 인원 반환
+        event = self.events[key]
+        participants = event["participants"]
+        if user_id in self.ids[key]:
+            return "duplicate", len(participants)
+        limit = event["participant_limit"]
+        if limit is not None and len(participants) >= limit:
+            return "full", len(participants)
+        entry = {"op": "join", "event": key, "id": user_id, "name": name}
+        self._apply(entry)
+        self._append(entry)
+        return "joined", len(participants)
+
+    def _append(self, entry):
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a")
+        self._journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        self._journal_lines += 1
+        if self._journal_lines >= self.compact_every:
+            self.save()
+
+    def save(self):
+        # 스냅샷을 원자적으로 교체한 뒤 저널 비우기 (중간에 죽어도 재생 시 중복은 ID 로 걸러짐)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        open(self.journal_path, "w").close()
+        self._journal_lines = 0
+
+    def remove(self, key):
+        self.events.pop(key, None)
+        self.ids.pop(key, None)
+        self.save()
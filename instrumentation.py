@@ -0,0 +1,139 @@
+import os
+import time
+import random
+import asyncio
+import cProfile
+import pstats
+import io
+from contextlib import contextmanager
+from telegram.ext import CommandHandler
+from metrics import Counter, Histogram, render as render_metrics
+
+# ---------- 봇 지표 ----------
+# BOT_METRICS_PORT 가 있으면 /metrics 를 연다 (프로세스별 모드는 포트 + 봇 번호, single 모드는 포트 그대로)
+# webhook 모드는 봇이 api_server 프로세스 안에서 돌고 api_server 의 /metrics 가 봇 지표도 함께 내보내므로 열지 않음
+BOT_METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", "0"))
+LOOP_LAG_INTERVAL = 0.5
+# 느린 핸들러 프로파일: 기준(ms, 0 이면 끔)과 프로파일러를 붙일 호출 비율
+PROFILE_SLOW_MS = float(os.getenv("BOT_PROFILE_SLOW_MS", "0"))
+PROFILE_SAMPLE = float(os.getenv("BOT_PROFILE_SAMPLE", "0.1"))
+PROFILE_DIR = os.getenv("BOT_PROFILE_DIR", os.path.join(os.getenv("BOT_DATA_DIR", "/mnt/data"), "profiles"))
+
+HANDLER_LATENCY = Histogram("bot_handler_duration_seconds", "텔레그램 핸들러 처리 시간", ["bot", "handler"])
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "예외로 끝난 핸들러 호출 수", ["bot", "handler"])
+HANDLER_SLOW = Counter("bot_handler_slow_total", "기준 시간을 넘긴 핸들러 호출 수", ["bot", "handler"])
+LOOP_LAG = Histogram("bot_event_loop_lag_seconds", "이벤트 루프 지연 (예약한 시각보다 늦게 깨어난 시간)")
+BLOCKING_IO = Histogram("bot_blocking_io_seconds", "이벤트 루프 안에서 한 동기 I/O 시간", ["op"])
+
+_lag_task = None
+_metrics_server = None
+_profiling = False
+
+@contextmanager
+def blocking_io(op):
+    # 핸들러 안의 동기 SQLite/파일 작업을 감싸 시간 기록
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        BLOCKING_IO.observe(time.perf_counter() - started, op=op)
+
+def handler_name(handler):
+    if isinstance(handler, CommandHandler):
+        return "/" + sorted(handler.commands)[0]
+    return getattr(handler.callback, "__name__", type(handler).__name__)
+
+def _dump_profile(profiler, bot, name, elapsed):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+    path = os.path.join(PROFILE_DIR, f"{bot}_{name.strip('/')}_{int(time.time() * 1000)}.txt")
+    with open(path, "w") as f:
+        f.write(f"{bot} {name} {elapsed * 1000:.1f}ms\n\n{out.getvalue()}")
+    return path
+
+def _wrap(callback, bot, name):
+    async def timed(update, context):
+        global _profiling
+        profiler = None
+        if PROFILE_SLOW_MS > 0 and not _profiling and random.random() < PROFILE_SAMPLE:
+            # 한 번에 하나만 (프로파일러는 스레드 전체를 보므로 그동안 돈 다른 태스크도 함께 잡힘)
+            _profiling = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(bot=bot, handler=name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            HANDLER_LATENCY.observe(elapsed, bot=bot, handler=name)
+            if profiler is not None:
+                profiler.disable()
+                _profiling = False
+            if PROFILE_SLOW_MS > 0 and elapsed * 1000 >= PROFILE_SLOW_MS:
+                HANDLER_SLOW.inc(bot=bot, handler=name)
+                where = ""
+                if profiler is not None:
+                    where = f" → {_dump_profile(profiler, bot, name, elapsed)}"
+                print(f"🐢 [{bot}] {name} {elapsed * 1000:.0f}ms{where}")
+    timed.__name__ = getattr(callback, "__name__", "handler")
+    return timed
+
+async def _watch_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + LOOP_LAG_INTERVAL
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        LOOP_LAG.observe(max(0.0, loop.time() - expected))
+
+async def _serve_metrics(reader, writer):
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        if request_line.split(b" ")[1:2] == [b"/metrics"]:
+            body, status = render_metrics().encode(), "200 OK"
+        else:
+            body, status = b"not found\n", "404 Not Found"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except Exception:
+        pass
+    finally:
+        writer.close()
+
+def metrics_port(bot):
+    if os.getenv("BOT_RUNTIME") == "single":
+        return BOT_METRICS_PORT
+    return BOT_METRICS_PORT + int("".join(ch for ch in bot if ch.isdigit()) or 0)
+
+async def start_monitoring(bot):
+    # 프로세스당 한 번만: 루프 지연 측정 + /metrics 서버
+    global _lag_task, _metrics_server
+    if _lag_task is None or _lag_task.done():
+        _lag_task = asyncio.create_task(_watch_loop_lag())
+    if BOT_METRICS_PORT and _metrics_server is None and os.getenv("BOT_RUNTIME") != "webhook":
+        port = metrics_port(bot)
+        _metrics_server = await asyncio.start_server(_serve_metrics, "0.0.0.0", port)
+        print(f"📈 [{bot}] metrics on :{port}/metrics")
+
+def instrument(app, bot):
+    """build_app 끝에서 호출: 등록된 모든 핸들러를 시간 측정 래퍼로 감싸고 post_init 에 모니터링을 붙인다."""
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            handler.callback = _wrap(handler.callback, bot, handler_name(handler))
+    post_init = app.post_init
+
+    async def init_with_monitoring(application):
+        await start_monitoring(bot)
+        if post_init:
+            await post_init(application)
+
+    app.post_init = init_with_monitoring
+    return app
@@ -0,0 +1,55 @@
+import bisect
+
+# ---------- 순위표 ----------
+class Leaderboard:
+    """(-점수, 사용자) 순으로 정렬된 리스트를 유지하는 순위표.
+
+    점수가 바뀌면 해당 항목만 bisect 로 빼고 다시 넣으므로 전체 정렬이 없다.
+    순위 조회는 O(log n), 페이지 조회는 보여줄 구간만 잘라낸다.
+    """
+
+    def __init__(self, scores=()):
+        self._scores = {}
+        self._entries = []
+        for user_id, score in scores:
+            self._scores[user_id] = score
+        self._entries = sorted((-score, user_id) for user_id, score in self._scores.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, user_id):
+        return user_id in self._scores
+
+    def score(self, user_id):
+        return self._scores.get(user_id, 0)
+
+    def set(self, user_id, score):
+        old = self._scores.get(user_id)
+        if old is not None:
+            i = bisect.bisect_left(self._entries, (-old, user_id))
+            del self._entries[i]
+        self._scores[user_id] = score
+        bisect.insort(self._entries, (-score, user_id))
+
+    def incr(self, user_id, amount=1):
+        self.set(user_id, self.score(user_id) + amount)
+
+    def clear(self):
+        self._scores.clear()
+        self._entries.clear()
+
+    def rank(self, user_id):
+        # page() 와 같은 기준의 1부터 시작하는 순위
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return bisect.bisect_left(self._entries, (-score, user_id)) + 1
+
+    def page(self, offset, limit):
+        # [(순위, 사용자, 점수), ...]
+        rows = []
+        for i in range(offset, min(offset + limit, len(self._entries))):
+            neg_score, user_id = self._entries[i]
+            rows.append((i + 1, user_id, -neg_score))
+        return rows
@@ -1,5 +1,11 @@
+import os
 from multiprocessing import Process
 import importlib
+from runtime import BOT_MODULES
+
+# process: 봇마다 프로세스 하나 (기본), single: 한 프로세스/이벤트 루프에서 모두 실행 (폴링),
+# webhook: api_server 가 웹훅으로 업데이트를 받아 같은 프로세스에서 모두 실행
+BOT_RUNTIME = os.getenv("BOT_RUNTIME", "process")
 
 def run_bot(module_name):
     print(f"✅ Starting {module_name}")
@@ -7,15 +13,16 @@ def run_bot(module_name):
     module.safe_main()
 
 if __name__ == "__main__":
-    modules = [
-        "bot1_code_creator",
-        "bot2_scheduler",
-        "bot3_rule_forwarder",
-        "bot4_share_tracker",
-        "bot5_emoji_event"
-    ]
-    processes = [Process(target=run_bot, args=(m,)) for m in modules]
-    for p in processes:
-        p.start()
-    for p in processes:
-        p.join()
+    modules = BOT_MODULES
+    if BOT_RUNTIME == "single":
+        import runtime
+        runtime.run(modules)
+    elif BOT_RUNTIME == "webhook":
+        import uvicorn
+        uvicorn.run("api_server:app", host="0.0.0.0", port=int(os.getenv("PORT", "10000")))
+    else:
+        processes = [Process(target=run_bot, args=(m,)) for m in modules]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
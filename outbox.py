@@ -0,0 +1,215 @@
+import json
+import time
+import uuid
+import random
+import sqlite3
+import asyncio
+import httpx
+
+# ---------- 외부 전송 대기열 (outbox) ----------
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS outbox (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        id TEXT NOT NULL UNIQUE,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt REAL NOT NULL,
+        created_at REAL NOT NULL
+    )
+'''
+# 끝내 보내지 못한 항목 (영구 오류이거나 max_attempts 를 넘김). 확인 후 수동으로 다시 넣거나 지움
+DEAD_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS outbox_dead (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        attempts INTEGER NOT NULL,
+        error TEXT,
+        created_at REAL NOT NULL,
+        failed_at REAL NOT NULL
+    )
+'''
+
+class PermanentError(Exception):
+    # sender 가 다시 보내도 소용없는 실패를 알릴 때 사용 (바로 outbox_dead 로 옮김)
+    pass
+
+def is_permanent(error):
+    # 요청 자체가 잘못된 4xx 는 재시도해도 같으므로 영구 실패 (408 시간 초과, 429 요청 제한은 재시도)
+    if isinstance(error, PermanentError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return 400 <= status < 500 and status not in (408, 429)
+    return False
+
+class Outbox:
+    """핸들러는 add() 로 로컬 SQLite 에 바로 적어두고, 백그라운드 작업자가 전송한다.
+
+    - 종류(kind)마다 register() 한 sender(client, items) 가 한 묶음을 보낸다.
+      items 는 [(id, payload), ...] 이고, 예외 없이 끝나면 전송 완료로 보고 지운다.
+    - 대기 중인 같은 id 는 한 번만 들어간다. 전송이 끝나 지운 뒤에 같은 id 로 add() 하면 다시 보낸다.
+    - 실패하면 그 종류 전체를 지수 백오프로 미뤄서 종류 안의 순서가 바뀌지 않는다.
+    - 영구 실패(4xx, PermanentError)이거나 max_attempts 번 실패한 묶음은 outbox_dead 로 옮겨
+      뒤 항목을 막지 않는다.
+    - HTTP 연결은 keep-alive 클라이언트 하나(self.client)를 공유한다.
+    """
+
+    def __init__(self, path, batch_size=50, base_backoff=1.0, max_backoff=300.0, timeout=10.0, max_attempts=30):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.client = None
+        self._senders = {}
+        self._task = None
+        self._wakeup = None
+        self._sending = asyncio.Lock()  # 작업자와 flush() 가 같은 묶음을 동시에 보내지 않도록
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(SCHEMA)
+            self.conn.execute(DEAD_SCHEMA)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_kind ON outbox(kind, seq)")
+
+    def register(self, kind, sender, batch_size=None):
+        self._senders[kind] = (sender, batch_size or self.batch_size)
+
+    def add(self, kind, payload, item_id=None):
+        item_id = item_id or uuid.uuid4().hex
+        now = time.time()
+        with self.conn:
+            # 백오프 중인 종류에 새로 들어온 항목은 앞 항목보다 먼저 나가지 않도록 같은 시각으로 맞춤
+            row = self.conn.execute("SELECT MAX(next_attempt) FROM outbox WHERE kind = ?", (kind,)).fetchone()
+            next_attempt = max(now, row[0] or now)
+            self.conn.execute(
+                "INSERT OR IGNORE INTO outbox (id, kind, payload, next_attempt, created_at) VALUES (?, ?, ?, ?, ?)",
+                (item_id, kind, json.dumps(payload), next_attempt, now)
+            )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return item_id
+
+    def pending(self, kind=None):
+        if kind is None:
+            return self.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM outbox WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def dead(self, kind=None):
+        if kind is None:
+            return self.conn.execute("SELECT COUNT(*) FROM outbox_dead").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM outbox_dead WHERE kind = ?", (kind,)).fetchone()[0]
+
+    # ---------- 작업자 ----------
+    async def start(self):
+        if self._task is not None:
+            return
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_keepalive_connections=5, keepalive_expiry=60)
+        )
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, flush_timeout=5.0):
+        # 남은 항목을 잠깐 더 보내보고, 못 보낸 것은 다음 실행 때 이어서 보냄
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.flush(), flush_timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.client.aclose()
+        self.client = None
+
+    async def flush(self):
+        # 지금 보낼 수 있는 항목이 없어질 때까지 전송
+        while await self.send_due():
+            pass
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                sent = await self.send_due()
+            except Exception as e:
+                print(f"❌ [Outbox] 전송 루프 오류: {e}")
+                sent = False
+            if sent:
+                continue
+            # sender 가 등록되지 않은 종류는 보내지 않으므로 대기 시간 계산에서도 뺌
+            kinds = list(self._senders)
+            row = self.conn.execute(
+                f"SELECT MIN(next_attempt) FROM outbox WHERE kind IN ({','.join('?' * len(kinds))})", kinds
+            ).fetchone()
+            delay = 60.0 if row[0] is None else max(0.05, row[0] - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def send_due(self):
+        # 종류별로 가장 오래된 한 묶음씩 보냄. 하나라도 보냈으면 True
+        async with self._sending:
+            return await self._send_due()
+
+    async def _send_due(self):
+        now = time.time()
+        kinds = [r[0] for r in self.conn.execute(
+            "SELECT DISTINCT kind FROM outbox WHERE next_attempt <= ?", (now,)
+        ).fetchall()]
+        sent = False
+        for kind in kinds:
+            if kind not in self._senders:
+                continue
+            sender, batch_size = self._senders[kind]
+            rows = self.conn.execute(
+                "SELECT id, payload, attempts FROM outbox WHERE kind = ? ORDER BY seq LIMIT ?",
+                (kind, batch_size)
+            ).fetchall()
+            items = [(item_id, json.loads(payload)) for item_id, payload, _ in rows]
+            ids = [(item_id,) for item_id, _ in items]
+            try:
+                await sender(self.client, items)
+            except Exception as e:
+                attempts = max(r[2] for r in rows) + 1
+                if is_permanent(e) or attempts >= self.max_attempts:
+                    self._bury(kind, ids, attempts, e)
+                    print(f"☠️ [Outbox] {kind} {len(items)}건 전송 포기 ({attempts}회째): {e}")
+                    sent = True  # 다음 항목은 기다리지 않고 바로 보냄
+                    continue
+                delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+                delay *= 1 + random.random() * 0.1
+                print(f"❌ [Outbox] {kind} {len(items)}건 전송 실패 ({attempts}회째, {delay:.0f}초 후 재시도): {e}")
+                with self.conn:
+                    self.conn.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", ids)
+                    self.conn.execute(
+                        "UPDATE outbox SET next_attempt = ? WHERE kind = ?", (time.time() + delay, kind)
+                    )
+                continue
+            with self.conn:
+                self.conn.executemany("DELETE FROM outbox WHERE id = ?", ids)
+            sent = True
+        return sent
+
+    def _bury(self, kind, ids, attempts, error):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO outbox_dead (id, kind, payload, attempts, error, created_at, failed_at) "
+                "SELECT id, kind, payload, ?, ?, created_at, ? FROM outbox WHERE id = ?",
+                [(attempts, str(error), now, item_id) for (item_id,) in ids]
+            )
+            self.conn.executemany("DELETE FROM outbox WHERE id = ?", ids)
+            # 막혀 있던 뒤 항목들의 백오프 해제
+            self.conn.execute("UPDATE outbox SET next_attempt = ? WHERE kind = ? AND next_attempt > ?", (now, kind, now))
@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+
+# ---------- 토큰 버킷 ----------
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def wait_time(self, amount=1, now=None):
+        # 토큰이 amount 만큼 찰 때까지 남은 시간(초)
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def pause(self, seconds, now=None):
+        # seconds 동안 토큰이 생기지 않도록 잔량을 음수로 내림 (서버가 알려준 대기 시간 반영)
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def take(self, amount=1, now=None):
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+# ---------- 키별 제한기 ----------
+class KeyedRateLimiter:
+    """키(IP, 링크 등)마다 토큰 버킷을 두는 제한기.
+
+    버킷은 마지막 사용 순서로 OrderedDict 에 들어 있고 최대 max_keys 개까지만 유지한다.
+    가득 찰 만큼 오래 쓰이지 않은 버킷은 새 버킷과 같으므로 앞에서부터 지워도 결과가 같다.
+    """
+
+    def __init__(self, rate, burst, max_keys=100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.idle_ttl = burst / rate if rate > 0 else 0
+        self.allowed = 0
+        self.limited = 0
+        self.evicted = 0
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def bucket(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._evict(now)
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def allow(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        bucket = self.bucket(key, now)
+        if bucket.take(now=now):
+            self.allowed += 1
+            return True
+        self.limited += 1
+        return False
+
+    def _evict(self, now):
+        buckets = self._buckets
+        while buckets:
+            key, oldest = next(iter(buckets.items()))
+            if len(buckets) < self.max_keys and now - oldest.updated < self.idle_ttl:
+                break
+            del buckets[key]
+            self.evicted += 1
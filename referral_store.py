@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import time
+import secrets
+import sqlite3
+import threading
+
+# ---------- 추천 저장소 (SQLite) ----------
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS codes (
+        code TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL UNIQUE,
+        created_at REAL
+    )
+    ''',
+    # 추천 이벤트: 한 사용자는 한 번만 추천인으로 인정됨
+    '''
+    CREATE TABLE IF NOT EXISTS referral_events (
+        referred_id TEXT PRIMARY KEY,
+        referrer_id TEXT NOT NULL,
+        code TEXT NOT NULL,
+        created_at REAL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_referral_events_referrer ON referral_events(referrer_id)",
+    '''
+    CREATE TABLE IF NOT EXISTS referral_counts (
+        user_id TEXT PRIMARY KEY,
+        cnt INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_referral_counts_cnt ON referral_counts(cnt DESC)",
+    # 코드 할당 순번, 코드 섞기용 비밀키 등
+    '''
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    ''',
+]
+
+class ReferralStore:
+    """추천 코드와 추천 이벤트를 SQLite 에 저장한다.
+
+    코드 → 사용자, 사용자 → 코드 조회는 모두 인덱스 조회이고 모든 변경은 트랜잭션 단위로 원자적이다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            for sql in SCHEMA:
+                self.conn.execute(sql)
+
+    def close(self):
+        self.conn.close()
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM codes LIMIT 1").fetchone() is None
+
+    # ---------- 코드 ----------
+    def code_for_user(self, user_id):
+        row = self.conn.execute("SELECT code FROM codes WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def user_for_code(self, code):
+        row = self.conn.execute("SELECT user_id FROM codes WHERE code = ?", (code,)).fetchone()
+        return row[0] if row else None
+
+    def allocate_code(self, user_id, encode):
+        # 순번을 하나 올려 encode(순번) 을 사용자 코드로 배정 (이미 있으면 기존 코드)
+        with self._lock, self.conn:
+            existing = self.code_for_user(user_id)
+            if existing is not None:
+                return existing
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'code_counter'").fetchone()
+            counter = int(row[0]) if row else 0
+            while True:
+                code = encode(counter)
+                counter += 1
+                # 예전에 무작위로 만든 코드와 겹칠 때만 다음 순번으로 넘어감
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO codes (code, user_id, created_at) VALUES (?, ?, ?)",
+                    (code, user_id, time.time())
+                )
+                if cur.rowcount == 1:
+                    break
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('code_counter', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (str(counter),)
+            )
+            self.conn.execute("INSERT OR IGNORE INTO referral_counts (user_id, cnt) VALUES (?, 0)", (user_id,))
+        return code
+
+    def secret(self, name):
+        # 없으면 만들어서 저장해두는 비밀값 (재시작해도 같은 값)
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (name,)).fetchone()
+            if row is not None:
+                return row[0]
+            value = secrets.token_hex(32)
+            self.conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (name, value))
+        return value
+
+    # ---------- 추천 ----------
+    def record_referral(self, code, referred_id):
+        # 인정된 경우 추천인 ID, 아니면 None (없는 코드, 자기 추천, 이미 추천받은 사용자)
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT user_id FROM codes WHERE code = ?", (code,)).fetchone()
+            if row is None or row[0] == referred_id:
+                return None
+            referrer_id = row[0]
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO referral_events (referred_id, referrer_id, code, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (referred_id, referrer_id, code, time.time())
+            )
+            if cur.rowcount != 1:
+                return None
+            self.conn.execute(
+                "INSERT INTO referral_counts (user_id, cnt) VALUES (?, 1) "
+                "ON CONFLICT(user_id) DO UPDATE SET cnt = cnt + 1",
+                (referrer_id,)
+            )
+        return referrer_id
+
+    def count_for_user(self, user_id):
+        row = self.conn.execute("SELECT cnt FROM referral_counts WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def counts(self):
+        return self.conn.execute(
+            "SELECT user_id, cnt FROM referral_counts ORDER BY cnt DESC"
+        ).fetchall()
+
+    def reset_counts(self):
+        # 추천 수만 0 으로 (예전 /reset1 과 같음). 추천 이벤트는 남겨 이미 추천받은 사용자가 다시 인정되지 않게 함
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE referral_counts SET cnt = 0")
+
+    # ---------- 기존 JSON 가져오기 ----------
+    def import_json(self, json_path):
+        # referral_db.json ({"referrals", "codes", "counts"}) 을 한 트랜잭션으로 가져옴
+        with open(json_path, "r") as f:
+            data = json.load(f)
+        codes = data.get("codes", {})
+        counts = data.get("counts", {})
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO codes (code, user_id, created_at) VALUES (?, ?, ?)",
+                [(code, user_id, now) for code, user_id in codes.items()]
+            )
+            self.conn.executemany(
+                "INSERT INTO referral_counts (user_id, cnt) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET cnt = excluded.cnt",
+                [(user_id, int(cnt)) for user_id, cnt in counts.items()]
+            )
+        return len(codes), len(counts)
+
+def import_legacy(store, json_path):
+    # 저장소가 비어 있고 JSON 이 있으면 한 번만 가져온 뒤 파일 이름을 바꿔둠
+    if not os.path.exists(json_path) or not store.is_empty():
+        return False
+    n_codes, n_counts = store.import_json(json_path)
+    os.replace(json_path, json_path + ".imported")
+    print(f"📦 {json_path} 가져오기 완료: 코드 {n_codes}개, 추천 수 {n_counts}명")
+    return True
+
+if __name__ == "__main__":
+    # python referral_store.py referral_db.json referral.db
+    if len(sys.argv) != 3:
+        raise SystemExit("사용법: python referral_store.py <referral_db.json> <referral.db>")
+    store = ReferralStore(sys.argv[2])
+    n_codes, n_counts = store.import_json(sys.argv[1])
+    store.close()
+    print(f"✅ 코드 {n_codes}개, 추천 수 {n_counts}명 가져옴")
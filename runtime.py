@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import signal
+import asyncio
+import hashlib
+import importlib
+import httpx
+import settings_store
+from telegram import Update
+from telegram.ext import ApplicationBuilder
+from telegram.request import HTTPXRequest
+
+# ---------- 단일 프로세스 런타임 ----------
+# 모든 봇의 Application 을 한 이벤트 루프에서 돌리고 텔레그램 API 연결은 한 풀로 공유
+BOT_MODULES = [
+    "bot1_code_creator",
+    "bot2_scheduler",
+    "bot3_rule_forwarder",
+    "bot4_share_tracker",
+    "bot5_emoji_event"
+]
+POOL_SIZE = int(os.getenv("BOT_HTTP_POOL_SIZE", "64"))
+RESTART_MIN = float(os.getenv("BOT_RESTART_MIN", "1"))
+RESTART_MAX = float(os.getenv("BOT_RESTART_MAX", "300"))
+STABLE_AFTER = 60  # 이 시간(초) 이상 돌았으면 재시작 대기 시간을 처음으로 되돌림
+HEALTH_INTERVAL = 5
+
+# 웹훅 모드: 텔레그램이 {WEBHOOK_BASE_URL}/telegram/{봇 이름}/{경로 비밀값} 으로 업데이트를 보냄
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL")  # 비어 있으면 setWebhook 없이 로컬 수신만
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+shared_client = None
+webhook_routes = {}  # 봇 이름 → (경로 비밀값, 헤더 비밀값)
+running_apps = {}    # 봇 이름 → 웹훅으로 업데이트를 받는 중인 Application
+
+def get_shared_client():
+    global shared_client
+    if shared_client is None or shared_client.is_closed:
+        shared_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(5.0, pool=1.0),
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+        )
+    return shared_client
+
+class SharedHTTPXRequest(HTTPXRequest):
+    """모든 봇이 같은 httpx.AsyncClient(연결 풀)를 쓰는 요청 객체.
+
+    타임아웃은 요청마다 넘어가므로 클라이언트를 공유해도 get_updates 의 긴 대기와 섞이지 않는다.
+    봇 하나가 종료돼도 공유 클라이언트는 닫지 않고 런타임 종료 때 한 번만 닫는다.
+    """
+
+    __slots__ = ()
+
+    def _build_client(self):
+        return get_shared_client()
+
+    async def shutdown(self):
+        pass
+
+def shared_builder():
+    return ApplicationBuilder().request(SharedHTTPXRequest()).get_updates_request(SharedHTTPXRequest())
+
+# ---------- 웹훅 ----------
+def bot_name(module_name):
+    return module_name.split("_", 1)[0]
+
+def webhook_secrets(token):
+    # 토큰에서 경로용/헤더용 비밀값을 따로 만듦 (경로가 로그에 남아도 헤더 값은 알 수 없음)
+    def derive(purpose):
+        return hashlib.blake2b(f"{purpose}:{token}".encode(), key=WEBHOOK_SECRET.encode()[:64], digest_size=16).hexdigest()
+    return derive("path"), derive("header")
+
+def webhook_url(name):
+    return f"{WEBHOOK_BASE_URL.rstrip('/')}/telegram/{name}/{webhook_routes[name][0]}"
+
+async def _teardown(app):
+    # run_polling 의 종료 순서를 그대로 따름 (각 단계 실패는 다음 단계를 막지 않음)
+    steps = [
+        lambda: app.updater.stop() if app.updater and app.updater.running else None,
+        lambda: app.stop() if app.running else None,
+        lambda: app.post_stop(app) if app.post_stop else None,
+        app.shutdown,
+        lambda: app.post_shutdown(app) if app.post_shutdown else None,
+    ]
+    for step in steps:
+        try:
+            result = step()
+            if result is not None:
+                await result
+        except Exception as e:
+            print(f"⚠️ 종료 중 오류: {e}")
+
+async def supervise(module_name, stop, webhook=False):
+    # 봇 하나를 돌리다 죽으면 지수 백오프로 다시 띄움 (다른 봇에는 영향 없음)
+    loop = asyncio.get_running_loop()
+    module = importlib.import_module(module_name)
+    name = bot_name(module_name)
+    delay = RESTART_MIN
+    while not stop.is_set():
+        started = loop.time()
+        app = None
+        try:
+            app = module.build_app(shared_builder())
+            await app.initialize()
+            if app.post_init:
+                await app.post_init(app)
+            if webhook:
+                await app.start()
+                if WEBHOOK_BASE_URL:
+                    await app.bot.set_webhook(webhook_url(name), secret_token=webhook_routes[name][1],
+                                              allowed_updates=Update.ALL_TYPES)
+                running_apps[name] = app
+            else:
+                # start_polling 은 남아 있는 웹훅을 지우고 시작하므로 폴링으로 되돌리기도 이것으로 충분
+                await app.updater.start_polling()
+                await app.start()
+            print(f"✅ {module_name} is running ({'webhook' if webhook else 'polling'})")
+            while not stop.is_set() and app.running and (webhook or app.updater.running):
+                try:
+                    await asyncio.wait_for(stop.wait(), HEALTH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            if not stop.is_set():
+                raise RuntimeError("폴링이 멈춤")
+        except Exception as e:
+            print(f"❌ {module_name} 오류: {e!r}")
+        finally:
+            running_apps.pop(name, None)
+            if app is not None:
+                await _teardown(app)
+        if stop.is_set():
+            break
+        if loop.time() - started > STABLE_AFTER:
+            delay = RESTART_MIN
+        print(f"🔁 {module_name} {delay:g}초 후 재시작")
+        try:
+            await asyncio.wait_for(stop.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+        delay = min(delay * 2, RESTART_MAX)
+
+def enabled_modules(module_names):
+    enabled = []
+    for name in module_names:
+        module = importlib.import_module(name)
+        if not getattr(module, "TOKEN", None):
+            print(f"⚠️ {name}: 토큰이 없어 건너뜀")
+            continue
+        webhook_routes[bot_name(name)] = webhook_secrets(module.TOKEN)
+        enabled.append(name)
+    return enabled
+
+async def run_all(module_names, webhook=False, stop=None):
+    # stop 을 넘기면(예: api_server 의 lifespan) 종료 신호 처리는 호출한 쪽이 맡음
+    if stop is None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                pass
+    module_names = enabled_modules(module_names)
+    try:
+        await asyncio.gather(*[supervise(name, stop, webhook) for name in module_names])
+    finally:
+        settings_store.flush_all()
+        if shared_client is not None:
+            await shared_client.aclose()
+
+def run(module_names=BOT_MODULES):
+    asyncio.run(run_all(module_names))
+
+# ---------- 기록된 업데이트 재생 ----------
+def replay(name, path, url="http://127.0.0.1:10000"):
+    # JSON 파일(업데이트 하나 또는 목록)을 로컬 웹훅 수신 경로로 POST: python runtime.py bot5 updates.json [URL]
+    module = importlib.import_module(next(m for m in BOT_MODULES if bot_name(m) == name))
+    path_secret, header_secret = webhook_secrets(module.TOKEN)
+    with open(path, "r") as f:
+        updates = json.load(f)
+    if isinstance(updates, dict):
+        updates = [updates]
+    with httpx.Client() as client:
+        for update in updates:
+            res = client.post(f"{url.rstrip('/')}/telegram/{name}/{path_secret}", json=update,
+                              headers={"X-Telegram-Bot-Api-Secret-Token": header_secret})
+            print(update.get("update_id"), res.status_code)
+
+if __name__ == "__main__":
+    replay(*sys.argv[1:4])
@@ -0,0 +1,181 @@
+import time
+import heapq
+import asyncio
+import datetime
+
+# ---------- cron 식 ----------
+FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]  # 분 시 일 월 요일(0=일)
+MIN_INTERVAL = 1  # 주기(분) 하한: 0 이하로 저장된 작업이 계속 바로 실행되며 루프를 막지 않도록
+
+def _parse_field(text, low, high):
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step <= 0:
+                raise ValueError(f"잘못된 간격: {text}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(x) for x in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"범위를 벗어남: {text}")
+        values.update(range(start, end + 1, step))
+    return values
+
+class CronExpr:
+    """표준 5필드 cron 식 (분 시 일 월 요일). 일/요일이 둘 다 지정되면 둘 중 하나만 맞아도 실행."""
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError("cron 식은 '분 시 일 월 요일' 5개 필드여야 합니다.")
+        self.expr = expr
+        parsed = [_parse_field(f, lo, hi) for f, (lo, hi) in zip(fields, FIELD_RANGES)]
+        self.minutes, self.hours, self.days, self.months, self.weekdays = parsed
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt):
+        weekday = (dt.weekday() + 1) % 7
+        if self.any_day:
+            return self.any_weekday or weekday in self.weekdays
+        if self.any_weekday:
+            return dt.day in self.days
+        return dt.day in self.days or weekday in self.weekdays
+
+    def next_after(self, dt):
+        # dt 이후(초과) 처음 맞는 시각. 맞지 않는 월/일/시는 통째로 건너뜀
+        dt = dt.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = dt + datetime.timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                year, month = (dt.year + 1, 1) if dt.month == 12 else (dt.year, dt.month + 1)
+                dt = dt.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(dt):
+                dt = (dt + datetime.timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if dt.hour not in self.hours:
+                dt = (dt + datetime.timedelta(hours=1)).replace(minute=0)
+                continue
+            if dt.minute not in self.minutes:
+                dt += datetime.timedelta(minutes=1)
+                continue
+            return dt
+        raise ValueError(f"실행 시각을 찾을 수 없습니다: {self.expr}")
+
+# ---------- 작업 스케줄러 ----------
+class Scheduler:
+    """이름 붙은 작업들을 다음 실행 시각 기준 min-heap 으로 관리한다.
+
+    작업(job)은 dict 이고 "interval"(분) 또는 "cron" 중 하나와 "enabled", "missed"(skip|catchup),
+    "next_run"(epoch 초)을 가진다. 작업이 추가/변경/삭제되면 대기 중인 루프를 바로 깨운다.
+    heap 항목은 (시각, 순번, 이름, 세대) 이고 세대가 바뀐 항목은 꺼낼 때 버린다.
+    dispatch(job) 는 실행 시 호출되는 코루틴 함수, save(jobs) 는 작업 목록 저장 함수.
+    """
+
+    def __init__(self, jobs, dispatch, save, tz=None):
+        self.jobs = jobs
+        self.dispatch = dispatch
+        self.save = save
+        self.tz = tz or datetime.timezone.utc
+        self._heap = []
+        self._generation = {}
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        self._tasks = set()
+
+    def next_run(self, job, after):
+        if job.get("cron"):
+            start = datetime.datetime.fromtimestamp(after, self.tz)
+            return CronExpr(job["cron"]).next_after(start).timestamp()
+        return after + max(float(job.get("interval", 60)), MIN_INTERVAL) * 60
+
+    def _push(self, name):
+        generation = self._generation.get(name, 0) + 1
+        self._generation[name] = generation
+        job = self.jobs[name]
+        if job.get("enabled") and job.get("next_run") is not None:
+            self._seq += 1
+            heapq.heappush(self._heap, (job["next_run"], self._seq, name, generation))
+        self._wakeup.set()
+
+    def restore(self, now=None):
+        # 재시작 시: 지나간 실행은 skip 이면 건너뛰고, catchup 이면 한 번 바로 실행
+        now = time.time() if now is None else now
+        for name, job in self.jobs.items():
+            if not job.get("enabled"):
+                continue
+            next_run = job.get("next_run")
+            if next_run is None or next_run < now:
+                if next_run is not None and job.get("missed") == "catchup":
+                    job["next_run"] = now
+                else:
+                    job["next_run"] = self.next_run(job, now) if next_run is not None else now
+            self._push(name)
+        self.save(self.jobs)
+
+    def upsert(self, name, job, start_now=False, keep_next_run=False):
+        # keep_next_run: 메시지처럼 주기와 상관없는 값만 바뀌면 잡혀 있던 다음 실행 시각을 그대로 둠
+        now = time.time()
+        job["name"] = name
+        if job.get("enabled"):
+            if not (keep_next_run and job.get("next_run") is not None):
+                job["next_run"] = now if start_now else self.next_run(job, now)
+        else:
+            job["next_run"] = None
+        self.jobs[name] = job
+        self._push(name)
+        self.save(self.jobs)
+
+    def set_enabled(self, name, enabled):
+        job = self.jobs[name]
+        job["enabled"] = enabled
+        # 인터벌 작업은 켜는 즉시 한 번 보냄 (예전 /start2 동작)
+        self.upsert(name, job, start_now=enabled and not job.get("cron"))
+
+    def remove(self, name):
+        self.jobs.pop(name, None)
+        self._generation[name] = self._generation.get(name, 0) + 1
+        self._wakeup.set()
+        self.save(self.jobs)
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            # 세대가 바뀐(변경/삭제된) 항목 버리기
+            while self._heap and self._heap[0][3] != self._generation.get(self._heap[0][2]):
+                heapq.heappop(self._heap)
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            due, _, name, _ = self._heap[0]
+            delay = due - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            job = self.jobs[name]
+            now = time.time()
+            job["last_run"] = now
+            job["next_run"] = self.next_run(job, max(now, due))
+            self._push(name)
+            self.save(self.jobs)
+            task = asyncio.create_task(self._dispatch(dict(job)))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, job):
+        try:
+            await self.dispatch(job)
+        except Exception as e:
+            print(f"❌ [Scheduler] 작업 '{job.get('name')}' 실행 오류: {e}")
@@ -0,0 +1,120 @@
+import os
+import copy
+import json
+import time
+import atexit
+import asyncio
+
+# ---------- 설정 문서 저장 ----------
+SETTINGS_DEBOUNCE = float(os.getenv("SETTINGS_DEBOUNCE", "0.5"))  # 변경을 모아서 쓸 시간(초)
+SETTINGS_POLL = float(os.getenv("SETTINGS_POLL", "2"))           # 다른 프로세스의 변경을 확인하는 간격(초)
+
+def _signature(path):
+    # os.replace 로 쓰면 inode 가 바뀌므로 mtime 해상도가 낮아도 변경을 놓치지 않음
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+class Document:
+    """JSON 설정 파일 하나를 메모리에 캐시한다.
+
+    읽을 때는 poll 초에 한 번만 stat 으로 다른 프로세스가 바꿨는지 확인하고, 바뀌었으면 다시 읽는다.
+    save() 는 debounce 초 동안의 변경을 모아 임시 파일 + os.replace 로 한 번에 쓴다.
+    이벤트 루프 밖에서 부르면 바로 쓴다. multiprocessing 자식 프로세스는 atexit 없이 끝나므로
+    봇은 종료 경로(safe_main, 런타임 종료)에서 flush_all() 을 직접 불러 남은 변경을 쓴다.
+    """
+
+    def __init__(self, path, default=None, migrate=None, debounce=SETTINGS_DEBOUNCE, poll=SETTINGS_POLL):
+        self.path = path
+        self.default = default or {}
+        self.migrate = migrate
+        self.debounce = debounce
+        self.poll = poll
+        self.listeners = []
+        self.dirty = False
+        self.writes = 0
+        self._data = None
+        self._signature = None
+        self._checked = 0.0
+        self._timer = None
+        self._timer_loop = None
+
+    def _load(self):
+        data = copy.deepcopy(self.default)
+        signature = _signature(self.path)
+        if signature is not None:
+            with open(self.path, "r") as f:
+                loaded = json.load(f)
+            if self.migrate:
+                loaded = self.migrate(loaded)
+            data.update(loaded)
+        self._data = data
+        self._signature = signature
+
+    @property
+    def data(self):
+        now = time.monotonic()
+        if self._data is None:
+            self._load()
+            self._checked = now
+        elif not self.dirty and now - self._checked >= self.poll:
+            self._checked = now
+            if _signature(self.path) != self._signature:
+                self._load()
+                for listener in self.listeners:
+                    listener(self._data)
+        return self._data
+
+    def on_change(self, listener):
+        # 다른 프로세스가 파일을 바꿔 다시 읽었을 때 호출됨
+        self.listeners.append(listener)
+
+    def replace(self, data):
+        self._data = data
+        self.save()
+
+    def save(self):
+        self.dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._timer is None or self._timer_loop is not loop:
+            self._timer = loop.call_later(self.debounce, self.flush)
+            self._timer_loop = loop
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.dirty:
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self._signature = _signature(self.path)
+        self.dirty = False
+        self.writes += 1
+
+documents = {}
+
+def document(path, default=None, migrate=None):
+    # 같은 경로는 프로세스 안에서 한 캐시를 같이 씀
+    doc = documents.get(path)
+    if doc is None:
+        doc = documents[path] = Document(path, default, migrate)
+    return doc
+
+def flush_all():
+    for doc in documents.values():
+        try:
+            doc.flush()
+        except Exception as e:
+            print(f"⚠️ 설정 저장 실패 ({doc.path}): {e}")
+
+# 일반 인터프리터 종료용 (multiprocessing 자식 프로세스에서는 실행되지 않음)
+atexit.register(flush_all)
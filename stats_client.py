@@ -0,0 +1,91 @@
+import time
+import asyncio
+
+# ---------- 클릭 통계 조회 클라이언트 ----------
+class StatsClient:
+    """api_server 의 /api/stats 를 TTL 캐시와 요청 묶음으로 감싼 클라이언트.
+
+    캐시에 없는 키는 window 초 동안 모았다가 POST 한 번으로 함께 묻고,
+    같은 키를 기다리는 호출들은 한 future 를 같이 기다린다.
+    http 는 pooled httpx.AsyncClient 를 돌려주는 함수.
+    """
+
+    def __init__(self, base_url, http, ttl=10.0, window=0.02, max_entries=10_000):
+        self.url = base_url.rstrip("/") + "/api/stats"
+        self.http = http
+        self.ttl = ttl
+        self.window = window
+        self.max_entries = max_entries
+        self.cache = {}      # (종류, 키) → (만료 시각, 값)
+        self.pending = {}    # 다음 요청에 넣을 키 → future
+        self.inflight = {}   # 보낸 요청의 결과를 기다리는 키 → future
+        self.requests = 0
+        self._task = None
+
+    async def uid_count(self, uid):
+        return await self._get(("uid", str(uid)))
+
+    async def vid_count(self, vid):
+        return await self._get(("vid", vid))
+
+    async def top(self, limit):
+        return await self._get(("top", limit))
+
+    def clear(self):
+        # 서버에서 통계가 바뀌었을 때 (초기화/재계산) 캐시 비우기
+        self.cache.clear()
+
+    async def _get(self, key):
+        hit = self.cache.get(key)
+        if hit and hit[0] > time.monotonic():
+            return hit[1]
+        fut = self.inflight.get(key) or self.pending.get(key)
+        if fut is None:
+            fut = self.pending[key] = asyncio.get_running_loop().create_future()
+            if self._task is None:
+                self._task = asyncio.create_task(self._flush_later())
+        # 한 호출이 취소돼도 같은 결과를 기다리는 다른 호출에는 영향 없음
+        return await asyncio.shield(fut)
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._task = None
+        batch, self.pending = self.pending, {}
+        self.inflight.update(batch)
+        try:
+            query = {
+                "uids": [k[1] for k in batch if k[0] == "uid"],
+                "vids": [k[1] for k in batch if k[0] == "vid"],
+                "top": max((k[1] for k in batch if k[0] == "top"), default=0),
+            }
+            resp = await self.http().post(self.url, json=query)
+            resp.raise_for_status()
+            data = resp.json()
+            self.requests += 1
+            self._prune()
+            expires = time.monotonic() + self.ttl
+            for key, fut in batch.items():
+                kind, name = key
+                if kind == "top":
+                    value = [tuple(row) for row in data["top"][:name]]
+                else:
+                    value = data[kind + "s"].get(name, 0)
+                self.cache[key] = (expires, value)
+                if not fut.done():
+                    fut.set_result(value)
+        except Exception as e:
+            for fut in batch.values():
+                if not fut.done():
+                    fut.set_exception(e)
+                    fut.exception()  # 기다리는 호출이 없어도 경고가 남지 않도록
+        finally:
+            for key in batch:
+                self.inflight.pop(key, None)
+
+    def _prune(self):
+        if len(self.cache) < self.max_entries:
+            return
+        now = time.monotonic()
+        self.cache = {k: v for k, v in self.cache.items() if v[0] > now}
+        if len(self.cache) >= self.max_entries:
+            self.cache.clear()
@@ -0,0 +1,100 @@
+import time
+import asyncio
+from telegram.error import Forbidden, NetworkError, RetryAfter
+from broadcast import BroadcastDispatcher
+
+# ---------- 가짜 Bot API ----------
+class StubBot:
+    """채팅별로 정해 둔 예외를 차례로 던지고, 다 쓰면 성공하는 send_message."""
+
+    def __init__(self, script=None):
+        self.script = {chat_id: list(errors) for chat_id, errors in (script or {}).items()}
+        self.calls = []  # (monotonic 시각, chat_id, 결과)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        errors = self.script.get(chat_id)
+        if errors:
+            error = errors.pop(0)
+            self.calls.append((time.monotonic(), chat_id, type(error).__name__))
+            raise error
+        self.calls.append((time.monotonic(), chat_id, "ok"))
+        return True
+
+def run(coro):
+    return asyncio.run(coro)
+
+# ---------- 테스트 ----------
+def test_stats_count_each_outcome():
+    bot = StubBot({
+        1: [RetryAfter(1)],
+        2: [NetworkError("연결 끊김"), NetworkError("연결 끊김")],
+        3: [Forbidden("bot was blocked by the user")],
+    })
+    dispatcher = BroadcastDispatcher(bot, global_rate=100, private_rate=100, retry_delay=0.01)
+    stats = run(dispatcher.broadcast([1, 2, 3, 4], "공지"))
+
+    assert stats["total"] == 4
+    assert stats["sent"] == 3
+    assert stats["failed"] == 1
+    assert stats["retried"] == 2
+    assert stats["retry_after"] == 1
+    assert list(stats["errors"]) == ["3"]
+    assert [c[2] for c in bot.calls if c[1] == 1] == ["RetryAfter", "ok"]
+
+def test_network_errors_give_up_after_max_retries():
+    bot = StubBot({5: [NetworkError("timeout")] * 10})
+    dispatcher = BroadcastDispatcher(bot, global_rate=100, private_rate=100, max_retries=2, retry_delay=0.01)
+    stats = run(dispatcher.broadcast([5], "공지"))
+
+    assert stats["sent"] == 0
+    assert stats["failed"] == 1
+    assert stats["retried"] == 2
+    assert len(bot.calls) == 3  # 처음 1번 + 재시도 2번
+
+def test_retry_after_pauses_every_chat():
+    # RetryAfter 를 받으면 전체 버킷도 멈추므로 그 사이에는 어떤 채팅에도 보내지 않음
+    bot = StubBot({1: [RetryAfter(1)]})
+    dispatcher = BroadcastDispatcher(bot, global_rate=20, private_rate=100)
+    stats = run(dispatcher.broadcast(list(range(1, 11)), "공지"))
+
+    assert stats["sent"] == 10
+    paused_at = next(t for t, chat_id, result in bot.calls if result == "RetryAfter")
+    after = [t for t, _, _ in bot.calls if t > paused_at]
+    assert after and min(after) - paused_at >= 0.95
+
+def test_global_rate_paces_sends():
+    bot = StubBot()
+    dispatcher = BroadcastDispatcher(bot, global_rate=20, private_rate=100)
+    started = time.monotonic()
+    stats = run(dispatcher.broadcast(list(range(1, 41)), "공지"))
+
+    assert stats["sent"] == 40
+    # 처음 20건은 버킷에 있던 토큰, 나머지 20건은 초당 20건 속도
+    assert time.monotonic() - started >= 0.95
+
+def test_per_chat_rate_paces_repeated_chat():
+    bot = StubBot()
+    dispatcher = BroadcastDispatcher(bot, global_rate=100, private_rate=5)
+    run(dispatcher.broadcast([7, 7, 7], "공지"))
+
+    times = sorted(t for t, _, _ in bot.calls)
+    assert len(times) == 3
+    assert all(b - a >= 0.19 for a, b in zip(times, times[1:]))
+
+def test_group_chats_use_group_rate():
+    bot = StubBot()
+    dispatcher = BroadcastDispatcher(bot, global_rate=100, private_rate=100, group_rate=4)
+    run(dispatcher.broadcast([-100, -100], "공지"))
+
+    first, second = sorted(t for t, _, _ in bot.calls)
+    assert second - first >= 0.24
+
+def test_channel_usernames_use_group_rate():
+    # "@채널이름" 은 숫자로 바꿀 수 없어도 그룹/채널 속도로 보냄
+    bot = StubBot()
+    dispatcher = BroadcastDispatcher(bot, global_rate=100, private_rate=100, group_rate=4)
+    stats = run(dispatcher.broadcast(["@channel", "@channel"], "공지"))
+
+    assert stats["sent"] == 2
+    first, second = sorted(t for t, _, _ in bot.calls)
+    assert second - first >= 0.24
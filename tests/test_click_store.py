@@ -0,0 +1,111 @@
+import asyncio
+import datetime
+import pytest
+from click_store import (ClickRetention, ClickWriter, connect, init_click_db, rebuild_counters, top_uids,
+                         uid_count, vid_counts)
+
+def make_db(tmp_path):
+    path = str(tmp_path / "clicks.db")
+    conn = connect(path)
+    init_click_db(conn)
+    conn.close()
+    return path
+
+def run_clicks(writer, clicks):
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        futures = [writer.submit(loop, *click) for click in clicks]
+        return await asyncio.gather(*futures)
+    try:
+        return asyncio.run(scenario())
+    finally:
+        writer.stop()
+
+# ---------- 기록기 ----------
+def test_batch_mode_groups_clicks_into_few_commits(tmp_path):
+    path = make_db(tmp_path)
+    commits = []
+    writer = ClickWriter(path, batch_size=16, batch_ms=50, on_commit=lambda seconds, rows: commits.append(rows))
+    clicks = [("v1", f"u{i % 5}", f"ip{i}", "2024-01-01") for i in range(40)]
+    results = run_clicks(writer, clicks + [clicks[0]])
+
+    assert results == ["counted"] * 40 + ["duplicate"]
+    assert sum(commits) == 41
+    assert max(commits) <= 16
+    assert len(commits) <= 6  # 한 건씩 커밋했다면 41번
+
+    conn = connect(path)
+    assert uid_count(conn, "u0") == 8
+    assert top_uids(conn, 1) == [("u0", 8)]
+    conn.close()
+
+def test_durable_mode_commits_every_click(tmp_path):
+    path = make_db(tmp_path)
+    commits = []
+    writer = ClickWriter(path, mode="durable", batch_size=16, on_commit=lambda seconds, rows: commits.append(rows))
+    run_clicks(writer, [("v1", "u1", f"ip{i}", "2024-01-01") for i in range(5)])
+    assert commits == [1] * 5
+
+def test_call_runs_after_earlier_clicks(tmp_path):
+    path = make_db(tmp_path)
+    writer = ClickWriter(path, batch_size=100, batch_ms=200)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        clicks = [writer.submit(loop, "v1", "u1", f"ip{i}", "2024-01-01") for i in range(3)]
+        count = writer.call(loop, lambda conn: uid_count(conn, "u1"))
+        await asyncio.gather(*clicks)
+        return await count
+
+    try:
+        assert asyncio.run(scenario()) == 3
+    finally:
+        writer.stop()
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ClickWriter(str(tmp_path / "clicks.db"), mode="bacth")
+
+# ---------- 보관 기간 ----------
+def days_ago(n):
+    return (datetime.datetime.utcnow().date() - datetime.timedelta(days=n)).isoformat()
+
+def test_retention_rolls_up_old_days_without_changing_counts(tmp_path):
+    conn = connect(make_db(tmp_path))
+    rows = [(f"v{i % 3}", f"u{i % 7}", f"ip{i}", days_ago(40 + i % 4)) for i in range(500)]
+    rows += [(f"v{i % 3}", f"u{i % 7}", f"ip{i}", days_ago(1)) for i in range(50)]
+    with conn:
+        conn.executemany("INSERT INTO clicks (vid, uid, ip, date) VALUES (?, ?, ?, ?)", rows)
+    before_top = dict(top_uids(conn, 10))
+    before_vids = vid_counts(conn, ["v0", "v1", "v2"])
+
+    retention = ClickRetention(30, rollup_rows=64)
+    steps = 0
+    while retention.step(conn):
+        steps += 1
+        assert steps < 100
+    assert steps >= 500 // 64  # 한 번에 rollup_rows 건씩 나눠서 합침
+
+    # 오래된 원본은 날짜별 집계로 옮겨지고 최근 클릭은 그대로
+    assert conn.execute("SELECT COUNT(*) FROM clicks").fetchone()[0] == 50
+    assert conn.execute("SELECT SUM(cnt) FROM click_daily").fetchone()[0] == 500
+    assert dict(top_uids(conn, 10)) == before_top
+    assert vid_counts(conn, ["v0", "v1", "v2"]) == before_vids
+    # 집계를 다시 계산해도 같은 값 (click_daily + 남은 원본)
+    rebuild_counters(conn)
+    assert dict(top_uids(conn, 10)) == before_top
+    assert vid_counts(conn, ["v0", "v1", "v2"]) == before_vids
+    conn.close()
+
+def test_retention_step_reclaims_free_pages(tmp_path):
+    conn = connect(make_db(tmp_path))
+    with conn:
+        conn.executemany("INSERT INTO clicks (vid, uid, ip, date) VALUES (?, ?, ?, ?)",
+                         [("v" * 50, f"u{i}", f"ip{i}" * 20, days_ago(60)) for i in range(3000)])
+    retention = ClickRetention(30, vacuum_pages=8, rollup_rows=5000)
+    assert retention.step(conn)  # 합치고 지움
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+    while retention.step(conn):
+        pass
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    conn.close()
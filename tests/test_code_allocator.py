@@ -0,0 +1,29 @@
+import pytest
+from code_allocator import ALPHABET, CodeAllocator
+
+# ---------- 테스트 ----------
+def test_permute_is_a_bijection_on_the_whole_domain():
+    allocator = CodeAllocator("비밀키", length=3)
+    values = [allocator.permute(n) for n in range(allocator.domain)]
+    assert sorted(values) == list(range(allocator.domain))
+
+def test_codes_are_unique_fixed_length_base36():
+    allocator = CodeAllocator("비밀키")
+    codes = [allocator.encode(n) for n in range(20000)]
+    assert len(set(codes)) == len(codes)
+    assert all(len(code) == 6 and set(code) <= set(ALPHABET) for code in codes)
+
+def test_codes_depend_on_the_key_and_are_stable():
+    first = [CodeAllocator("a").encode(n) for n in range(50)]
+    assert first == [CodeAllocator("a").encode(n) for n in range(50)]
+    assert first != [CodeAllocator("b").encode(n) for n in range(50)]
+    # 연속 순번이 연속 코드로 나오지 않음
+    assert first != sorted(first)
+
+def test_long_keys_are_accepted():
+    assert len(CodeAllocator("k" * 200).encode(0)) == 6
+
+@pytest.mark.parametrize("n", [-1, len(ALPHABET) ** 2])
+def test_out_of_range_counter_raises(n):
+    with pytest.raises(ValueError):
+        CodeAllocator("key", length=2).encode(n)
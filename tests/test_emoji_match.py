@@ -0,0 +1,61 @@
+from emoji_match import EmojiMatcher, graphemes
+
+THUMBS = "\U0001F44D"                    # 👍
+THUMBS_MEDIUM = THUMBS + "\U0001F3FD"    # 👍🏽
+MAN = "\U0001F468"                       # 👨
+FAMILY = "\u200d".join([MAN, "\U0001F469", "\U0001F467"])  # 👨‍👩‍👧
+FLAG_KR = "\U0001F1F0\U0001F1F7"         # 🇰🇷
+FLAG_US = "\U0001F1FA\U0001F1F8"         # 🇺🇸
+HEART = "\u2764"                         # ❤
+KEYCAP_1 = "1\ufe0f\u20e3"              # 1️⃣
+
+def matcher(**patterns):
+    m = EmojiMatcher()
+    for key, pattern in patterns.items():
+        m.add(key, pattern)
+    return m
+
+# ---------- 그래핌 분리 ----------
+def test_graphemes_keep_sequences_together():
+    assert graphemes(f"a{FAMILY}{THUMBS_MEDIUM}{FLAG_KR}{FLAG_US}{KEYCAP_1}") == [
+        "a", FAMILY, THUMBS_MEDIUM, FLAG_KR, FLAG_US, KEYCAP_1
+    ]
+
+# ---------- 매칭 ----------
+def test_plain_emoji_does_not_match_inside_longer_clusters():
+    m = matcher(thumbs=THUMBS, man=MAN)
+    assert m.match(f"좋아요 {THUMBS}") == {"thumbs"}
+    assert m.match(THUMBS_MEDIUM) == set()   # 피부색이 붙은 것은 다른 이모지
+    assert m.match(FAMILY) == set()          # ZWJ 시퀀스 안의 👨 는 아님
+    assert m.match(f"{FAMILY} {MAN}") == {"man"}
+
+def test_skin_tone_and_zwj_patterns_match_exactly():
+    m = matcher(medium=THUMBS_MEDIUM, family=FAMILY)
+    assert m.match(f"x{THUMBS_MEDIUM}x") == {"medium"}
+    assert m.match(THUMBS) == set()
+    assert m.match(f"가족 {FAMILY}!") == {"family"}
+
+def test_flags_pair_regional_indicators():
+    m = matcher(kr=FLAG_KR)
+    assert m.match(f"{FLAG_US}{FLAG_KR}") == {"kr"}
+    # 🇺🇸🇰🇷 사이의 🇸🇰(슬로바키아) 로 잘못 묶이지 않음
+    assert matcher(sk="\U0001F1F8\U0001F1F0").match(f"{FLAG_US}{FLAG_KR}") == set()
+
+def test_variation_selector_is_ignored():
+    m = matcher(heart=HEART)
+    assert m.match(HEART + "\ufe0f") == {"heart"}
+    assert matcher(heart=HEART + "\ufe0f").match(HEART) == {"heart"}
+
+def test_multi_emoji_patterns_and_overlaps():
+    m = matcher(pair=THUMBS + THUMBS, single=THUMBS)
+    assert m.match(THUMBS) == {"single"}
+    assert m.match(THUMBS * 3) == {"pair", "single"}
+
+def test_remove_updates_matches():
+    m = matcher(a=THUMBS, b=FLAG_KR)
+    m.add("a", FLAG_KR)
+    assert m.match(FLAG_KR) == {"a", "b"}
+    m.remove_key("a", [THUMBS, FLAG_KR])
+    assert m.match(f"{THUMBS}{FLAG_KR}") == {"b"}
+    m.remove("b", FLAG_KR)
+    assert m.match(FLAG_KR) == set()
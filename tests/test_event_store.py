@@ -0,0 +1,83 @@
+import json
+from event_store import WILDCARD, EventStore, migrate_legacy
+
+def open_store(tmp_path, **kwargs):
+    store = EventStore(str(tmp_path / "event_data.json"), **kwargs)
+    store.load()
+    return store
+
+def journal_lines(store):
+    with open(store.journal_path) as f:
+        return f.read().splitlines()
+
+# ---------- 테스트 ----------
+def test_admit_respects_limit_and_duplicates(tmp_path):
+    store = open_store(tmp_path)
+    store.ensure("c1")["participant_limit"] = 2
+    assert store.admit("c1", 1, "가") == ("joined", 1)
+    assert store.admit("c1", 1, "가") == ("duplicate", 1)
+    assert store.admit("c1", 2, "나") == ("joined", 2)
+    assert store.admit("c1", 3, "다") == ("full", 2)
+
+def test_journal_is_replayed_on_load(tmp_path):
+    store = open_store(tmp_path)
+    store.ensure("c1")
+    store.save()
+    store.admit("c1", 1, "가")
+    store.admit("c1", 2, "나")
+    assert len(journal_lines(store)) == 2
+
+    reloaded = open_store(tmp_path)
+    assert [p["id"] for p in reloaded.event("c1")["participants"]] == [1, 2]
+    assert reloaded.admit("c1", 2, "나") == ("duplicate", 2)
+
+def test_torn_last_line_is_dropped_and_compacted(tmp_path):
+    store = open_store(tmp_path)
+    store.ensure("c1")
+    store.save()
+    store.admit("c1", 1, "가")
+    store._journal.write('{"op": "join", "event": "c1", "id": 2, "na')  # 쓰다가 죽음
+    store._journal.flush()
+
+    reloaded = open_store(tmp_path)
+    assert [p["id"] for p in reloaded.event("c1")["participants"]] == [1]
+    # 잘린 줄은 스냅샷으로 정리되어 뒤에 이어 쓰는 줄과 붙지 않음
+    assert journal_lines(reloaded) == []
+    reloaded.admit("c1", 3, "다")
+    assert [p["id"] for p in open_store(tmp_path).event("c1")["participants"]] == [1, 3]
+
+def test_journal_compacts_into_snapshot(tmp_path):
+    store = open_store(tmp_path, compact_every=3)
+    store.ensure("c1")
+    store.save()
+    for user_id in range(4):
+        store.admit("c1", user_id, f"u{user_id}")
+    # 3번째 참여에서 스냅샷을 다시 쓰고 저널을 비움
+    assert len(journal_lines(store)) == 1
+    with open(store.path) as f:
+        snapshot = json.load(f)
+    assert [p["id"] for p in snapshot["events"]["c1"]["participants"]] == [0, 1, 2]
+    assert [p["id"] for p in open_store(tmp_path).event("c1")["participants"]] == [0, 1, 2, 3]
+
+def test_replay_after_crash_between_snapshot_and_truncate(tmp_path):
+    store = open_store(tmp_path)
+    store.ensure("c1")
+    store.admit("c1", 1, "가")
+    lines = journal_lines(store)
+    store.save()
+    # 스냅샷은 바뀌었지만 저널을 비우기 전에 죽은 경우: 같은 참여가 두 번 들어가지 않음
+    with open(store.journal_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    assert [p["id"] for p in open_store(tmp_path).event("c1")["participants"]] == [1]
+
+def test_remove_and_legacy_migration(tmp_path):
+    store = open_store(tmp_path)
+    store.ensure("c1")
+    store.remove("c1")
+    assert open_store(tmp_path).event("c1") is None
+
+    legacy = {"emoji_to_track": "👍", "participant_limit": 3, "participants": [{"id": 1, "name": "가"}],
+              "event_started": True}
+    assert migrate_legacy(legacy)["events"][WILDCARD]["emojis"] == ["👍"]
+    # 설정된 적 없는 빈 예전 이벤트는 옮기지 않음
+    assert migrate_legacy({}) == {"events": {}}
@@ -0,0 +1,34 @@
+import socket
+import asyncio
+import instrumentation
+
+def start(monkeypatch, runtime, port):
+    monkeypatch.setattr(instrumentation, "BOT_METRICS_PORT", port)
+    monkeypatch.setattr(instrumentation, "_metrics_server", None)
+    monkeypatch.setattr(instrumentation, "_lag_task", None)
+    monkeypatch.setenv("BOT_RUNTIME", runtime)
+
+    async def scenario():
+        await instrumentation.start_monitoring("bot1")
+        # 열린 /metrics 포트 (열지 않았으면 None)
+        server = instrumentation._metrics_server
+        instrumentation._lag_task.cancel()
+        if server is None:
+            return None
+        bound = server.sockets[0].getsockname()[1]
+        server.close()
+        await server.wait_closed()
+        return bound
+
+    return asyncio.run(scenario())
+
+# ---------- 테스트 ----------
+def test_webhook_runtime_does_not_open_metrics_port(monkeypatch):
+    # api_server 의 /metrics 가 이미 봇 지표를 내보냄
+    assert start(monkeypatch, "webhook", 1) is None
+
+def test_single_runtime_opens_metrics_port(monkeypatch):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    assert start(monkeypatch, "single", port) == port
@@ -0,0 +1,192 @@
+import json
+import time
+import asyncio
+from outbox import Outbox
+
+# ---------- 로컬 대역 HTTP 서버 ----------
+class StandInServer:
+    """127.0.0.1 의 임의 포트에서 POST 를 받아 기록하고, statuses 에 넣어 둔 상태 코드를 차례로 돌려준다."""
+
+    def __init__(self, statuses=(), delay=0.0):
+        self.statuses = list(statuses)
+        self.delay = delay  # 응답 전에 기다릴 시간 (느린 서버 흉내)
+        self.requests = []  # (monotonic 시각, Idempotency-Key, 본문 JSON, 응답 상태)
+        self.server = None
+
+    @property
+    def url(self):
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/api"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status = self.statuses.pop(0) if self.statuses else 200
+                self.requests.append((time.monotonic(), headers.get("idempotency-key"), json.loads(body or b"null"), status))
+                await asyncio.sleep(self.delay)
+                writer.write(f"HTTP/1.1 {status} X\r\nContent-Length: 0\r\n\r\n".encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+def make_sender(server):
+    async def sender(client, items):
+        resp = await client.post(server.url, json=[payload for _, payload in items],
+                                 headers={"Idempotency-Key": items[0][0]})
+        resp.raise_for_status()
+    return sender
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "시간 안에 끝나지 않음"
+        await asyncio.sleep(0.01)
+
+async def run_outbox(tmp_path, statuses, batch_size, items, **kwargs):
+    server = StandInServer(statuses)
+    await server.start()
+    outbox = Outbox(str(tmp_path / "outbox.db"), **kwargs)
+    outbox.register("k", make_sender(server), batch_size=batch_size)
+    for item_id, payload in items:
+        outbox.add("k", payload, item_id=item_id)
+    await outbox.start()
+    try:
+        await wait_until(lambda: outbox.pending() == 0)
+    finally:
+        await outbox.stop()
+        await server.stop()
+    return outbox, server
+
+# ---------- 테스트 ----------
+def test_items_are_sent_in_batches_and_deleted(tmp_path):
+    items = [(f"id{i}", {"n": i}) for i in range(7)]
+    outbox, server = asyncio.run(run_outbox(tmp_path, [], 3, items))
+
+    assert [body for _, _, body, _ in server.requests] == [
+        [{"n": 0}, {"n": 1}, {"n": 2}],
+        [{"n": 3}, {"n": 4}, {"n": 5}],
+        [{"n": 6}],
+    ]
+    assert outbox.pending() == 0
+    assert outbox.dead() == 0
+
+def test_failures_back_off_without_reordering(tmp_path):
+    items = [("a", {"n": 1}), ("b", {"n": 2}), ("c", {"n": 3})]
+    outbox, server = asyncio.run(run_outbox(
+        tmp_path, [500, 503, 500], 1, items, base_backoff=0.05, max_backoff=1.0
+    ))
+
+    # 앞 항목이 성공할 때까지 뒤 항목은 나가지 않음
+    assert [key for _, key, _, _ in server.requests] == ["a", "a", "a", "a", "b", "c"]
+    assert [status for _, _, _, status in server.requests] == [500, 503, 500, 200, 200, 200]
+    # 재시도 간격은 지수적으로 늘어남 (0.05 → 0.1 → 0.2, 지터 10%)
+    times = [t for t, _, _, _ in server.requests[:4]]
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert gaps[0] >= 0.05 and gaps[1] >= 0.1 and gaps[2] >= 0.2
+    assert gaps[0] < gaps[1] < gaps[2]
+    assert outbox.pending() == 0
+
+def test_client_errors_go_to_dead_letters(tmp_path):
+    items = [("bad", {"n": 1}), ("good", {"n": 2})]
+    outbox, server = asyncio.run(run_outbox(tmp_path, [422], 1, items, base_backoff=0.05))
+
+    # 422 는 다시 보내지 않고 옮겨 두고, 뒤 항목은 기다리지 않고 바로 보냄
+    assert [(key, status) for _, key, _, status in server.requests] == [("bad", 422), ("good", 200)]
+    assert outbox.dead("k") == 1
+    assert outbox.pending() == 0
+
+def test_retryable_statuses_stop_at_max_attempts(tmp_path):
+    items = [("x", {"n": 1}), ("y", {"n": 2})]
+    outbox, server = asyncio.run(run_outbox(
+        tmp_path, [429, 408, 500], 1, items, base_backoff=0.01, max_attempts=3
+    ))
+
+    assert [key for _, key, _, _ in server.requests] == ["x", "x", "x", "y"]
+    assert outbox.dead("k") == 1
+    assert outbox.pending() == 0
+
+def test_pending_items_survive_restart(tmp_path):
+    async def scenario():
+        server = StandInServer([500])
+        await server.start()
+        path = str(tmp_path / "outbox.db")
+        first = Outbox(path, base_backoff=10)
+        first.register("k", make_sender(server), batch_size=1)
+        first.add("k", {"n": 1}, item_id="keep")
+        first.add("k", {"n": 1}, item_id="keep")  # 대기 중인 같은 id 는 한 번만
+        await first.start()
+        await wait_until(lambda: len(server.requests) == 1)
+        await first.stop(flush_timeout=0.1)
+        assert first.pending() == 1
+        first.conn.execute("UPDATE outbox SET next_attempt = 0")
+        first.conn.commit()
+
+        second = Outbox(path)
+        second.register("k", make_sender(server), batch_size=1)
+        await second.start()
+        await wait_until(lambda: second.pending() == 0)
+        await second.stop()
+        await server.stop()
+        return server
+
+    server = asyncio.run(scenario())
+    assert [(key, status) for _, key, _, status in server.requests] == [("keep", 500), ("keep", 200)]
+
+def test_stop_during_slow_send_does_not_resend(tmp_path):
+    async def scenario():
+        server = StandInServer(delay=0.3)
+        await server.start()
+        outbox = Outbox(str(tmp_path / "outbox.db"))
+        outbox.register("k", make_sender(server), batch_size=1)
+        outbox.add("k", {"n": 1}, item_id="once")
+        await outbox.start()
+        # 작업자가 보낸 요청이 아직 응답을 기다리는 중에 종료
+        await wait_until(lambda: len(server.requests) == 1)
+        await outbox.stop()
+        await server.stop()
+        return outbox, server
+
+    outbox, server = asyncio.run(scenario())
+    assert [key for _, key, _, _ in server.requests] == ["once"]
+    assert outbox.pending() == 0
+
+def test_unregistered_kind_does_not_wake_the_worker(tmp_path):
+    async def scenario():
+        outbox = Outbox(str(tmp_path / "outbox.db"))
+        outbox.add("unknown", {"n": 1})
+        calls = 0
+        send_due = outbox.send_due
+
+        async def counting_send_due():
+            nonlocal calls
+            calls += 1
+            return await send_due()
+
+        outbox.send_due = counting_send_due
+        await outbox.start()
+        await asyncio.sleep(0.5)
+        await outbox.stop(flush_timeout=0.1)
+        return calls
+
+    # 등록되지 않은 종류만 있으면 작업자는 한 번 확인하고 잠듦 (50ms 마다 깨지 않음)
+    assert asyncio.run(scenario()) <= 3
@@ -0,0 +1,29 @@
+from referral_store import ReferralStore
+
+def encode(n):
+    return f"C{n:05d}"
+
+# ---------- 테스트 ----------
+def test_referral_is_credited_once(tmp_path):
+    store = ReferralStore(str(tmp_path / "referral.db"))
+    code = store.allocate_code("alice", encode)
+    assert store.allocate_code("alice", encode) == code
+
+    assert store.record_referral(code, "bob") == "alice"
+    assert store.record_referral(code, "bob") is None     # 이미 추천받은 사용자
+    assert store.record_referral(code, "alice") is None   # 자기 추천
+    assert store.record_referral("NOPE", "carol") is None
+    assert store.count_for_user("alice") == 1
+    store.close()
+
+def test_reset_keeps_events_so_users_are_not_credited_again(tmp_path):
+    store = ReferralStore(str(tmp_path / "referral.db"))
+    code = store.allocate_code("alice", encode)
+    store.record_referral(code, "bob")
+    store.reset_counts()
+
+    assert store.counts() == [("alice", 0)]
+    assert store.record_referral(code, "bob") is None
+    assert store.record_referral(code, "carol") == "alice"
+    assert store.count_for_user("alice") == 1
+    store.close()
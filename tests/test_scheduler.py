@@ -0,0 +1,91 @@
+import time
+import asyncio
+import datetime
+import pytest
+from scheduler import CronExpr, Scheduler
+
+def at(*args):
+    return datetime.datetime(*args)
+
+# ---------- cron 식 ----------
+def test_next_after_steps_and_rolls_over():
+    assert CronExpr("*/15 * * * *").next_after(at(2024, 1, 1, 10, 7)) == at(2024, 1, 1, 10, 15)
+    # 정각에 맞는 시각이어도 그 시각 "이후"를 돌려줌
+    assert CronExpr("0 * * * *").next_after(at(2024, 1, 1, 10, 0)) == at(2024, 1, 1, 11, 0)
+    assert CronExpr("30 23 31 12 *").next_after(at(2024, 12, 31, 23, 30)) == at(2025, 12, 31, 23, 30)
+
+def test_next_after_weekday_and_day_of_month():
+    # 2024-01-01 은 월요일 (요일 1)
+    assert CronExpr("0 9 * * 1").next_after(at(2024, 1, 1, 9, 0)) == at(2024, 1, 8, 9, 0)
+    # 일과 요일이 둘 다 지정되면 둘 중 하나만 맞아도 됨: 13일보다 금요일(5일)이 먼저
+    assert CronExpr("0 0 13 * 5").next_after(at(2024, 1, 1)) == at(2024, 1, 5)
+    assert CronExpr("0 0 13 * 5").next_after(at(2024, 1, 12)) == at(2024, 1, 13)
+
+def test_next_after_finds_leap_day_and_rejects_impossible_dates():
+    assert CronExpr("0 0 29 2 *").next_after(at(2024, 3, 1)) == at(2028, 2, 29)
+    with pytest.raises(ValueError):
+        CronExpr("0 0 31 2 *").next_after(at(2024, 1, 1))
+
+@pytest.mark.parametrize("expr", ["* * * *", "60 * * * *", "* 24 * * *", "*/0 * * * *", "5-1 * * * *", "a * * * *"])
+def test_invalid_expressions_raise(expr):
+    with pytest.raises(ValueError):
+        CronExpr(expr)
+
+# ---------- 스케줄러 ----------
+def run_for(scheduler, seconds, before=None):
+    async def scenario():
+        task = asyncio.create_task(scheduler.run())
+        if before:
+            before()
+        await asyncio.sleep(seconds)
+        task.cancel()
+    asyncio.run(scenario())
+
+def make_scheduler(jobs=None):
+    ran, saved = [], []
+
+    async def dispatch(job):
+        ran.append(job["name"])
+
+    return Scheduler(jobs if jobs is not None else {}, dispatch, saved.append), ran, saved
+
+def test_replaced_and_removed_jobs_do_not_run_from_stale_entries():
+    scheduler, ran, _ = make_scheduler()
+
+    def change_jobs():
+        job = {"interval": 60, "enabled": True}
+        scheduler.upsert("twice", dict(job), start_now=True)
+        scheduler.upsert("twice", dict(job), start_now=True)  # 앞 항목은 세대가 바뀌어 버려짐
+        scheduler.upsert("removed", dict(job), start_now=True)
+        scheduler.remove("removed")
+        scheduler.upsert("paused", dict(job), start_now=True)
+        scheduler.set_enabled("paused", False)
+
+    run_for(scheduler, 0.2, change_jobs)
+    assert ran == ["twice"]
+    assert scheduler.jobs["twice"]["next_run"] > time.time() + 59 * 60
+
+def test_restore_skips_or_catches_up_missed_runs():
+    now = time.time()
+    jobs = {
+        "skip": {"name": "skip", "interval": 10, "enabled": True, "missed": "skip", "next_run": now - 3600},
+        "catchup": {"name": "catchup", "interval": 10, "enabled": True, "missed": "catchup", "next_run": now - 3600},
+        "off": {"name": "off", "interval": 10, "enabled": False, "next_run": None},
+    }
+    scheduler, ran, saved = make_scheduler(jobs)
+    scheduler.restore(now=now)
+
+    assert jobs["skip"]["next_run"] == now + 600
+    assert jobs["catchup"]["next_run"] == now
+    assert saved == [jobs]
+    run_for(scheduler, 0.2)
+    assert ran == ["catchup"]
+
+def test_keep_next_run_leaves_schedule_alone():
+    scheduler, _, _ = make_scheduler()
+    scheduler.upsert("job", {"interval": 60, "enabled": True})
+    next_run = scheduler.jobs["job"]["next_run"]
+    job = dict(scheduler.jobs["job"], message="새 메시지")
+    scheduler.upsert("job", job, keep_next_run=True)
+    assert scheduler.jobs["job"]["next_run"] == next_run
+    assert scheduler.jobs["job"]["message"] == "새 메시지"
@@ -0,0 +1,71 @@
+import os
+import asyncio
+import importlib
+import httpx
+import pytest
+
+# ---------- 준비 ----------
+class StubApplication:
+    """running_apps 에 넣는 가짜 Application: 업데이트를 update_queue 에 쌓기만 한다."""
+
+    def __init__(self):
+        self.bot = None
+        self.update_queue = asyncio.Queue()
+
+UPDATE = {"update_id": 7, "message": {
+    "message_id": 1, "date": 0, "chat": {"id": 42, "type": "private"}, "text": "안녕"
+}}
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    # api_server 는 import 할 때 DATA_DIR 에 DB 를 만드므로 임시 폴더로 돌림
+    os.environ["DATA_DIR"] = str(tmp_path_factory.mktemp("data"))
+    import api_server
+    return api_server
+
+@pytest.fixture
+def routes(monkeypatch):
+    runtime = importlib.import_module("runtime")
+    tg_app = StubApplication()
+    monkeypatch.setitem(runtime.webhook_routes, "bot9", ("pathsecret", "headersecret"))
+    monkeypatch.setitem(runtime.running_apps, "bot9", tg_app)
+    return tg_app
+
+def post(server, path, content=None, json=None, secret="headersecret"):
+    async def request():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret is not None else {}
+            return await client.post(path, content=content, json=json, headers=headers)
+    return asyncio.run(request())
+
+# ---------- 테스트 ----------
+def test_unknown_bot_or_path_is_not_found(server, routes):
+    assert post(server, "/telegram/nobot/pathsecret", json=UPDATE).status_code == 404
+    assert post(server, "/telegram/bot9/wrong", json=UPDATE).status_code == 404
+    assert routes.update_queue.empty()
+
+def test_bad_or_missing_secret_header_is_forbidden(server, routes):
+    assert post(server, "/telegram/bot9/pathsecret", json=UPDATE, secret="wrong").status_code == 403
+    assert post(server, "/telegram/bot9/pathsecret", json=UPDATE, secret=None).status_code == 403
+    # ASCII 가 아닌 헤더 값도 예외 없이 403
+    assert post(server, "/telegram/bot9/pathsecret", json=UPDATE, secret="비밀".encode()).status_code == 403
+    assert routes.update_queue.empty()
+
+def test_malformed_json_is_bad_request(server, routes):
+    res = post(server, "/telegram/bot9/pathsecret", content=b"{not json")
+    assert res.status_code == 400
+    assert routes.update_queue.empty()
+
+def test_valid_update_is_queued(server, routes):
+    res = post(server, "/telegram/bot9/pathsecret", json=UPDATE)
+    assert res.status_code == 200
+    update = routes.update_queue.get_nowait()
+    assert update.update_id == 7
+    assert update.message.text == "안녕"
+    assert update.message.chat.id == 42
+
+def test_restarting_bot_is_unavailable(server, routes, monkeypatch):
+    runtime = importlib.import_module("runtime")
+    monkeypatch.delitem(runtime.running_apps, "bot9")
+    assert post(server, "/telegram/bot9/pathsecret", json=UPDATE).status_code == 503
@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import threading
+
+# ---------- 영상 목록 캐시 ----------
+class VideoCatalog:
+    """video_data.json 을 메모리에 올려두고 조회는 dict 로만 처리한다.
+
+    파일이 밖에서 바뀌면 (mtime/size 비교, check_interval 초마다) 다시 읽는다.
+    변경이 적용될 때마다 카탈로그 version 이 1 올라가고, 각 영상과 삭제 기록(deleted)에
+    바뀐 시점의 version 이 남아서 changes_since() 로 차이만 주고받을 수 있다.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._data = {"videos": {}, "deleted": {}, "version": 0}
+        self._stamp = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp is None:
+                data = {"videos": {}, "deleted": {}, "version": 0}
+            else:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+                data.setdefault("videos", {})
+                data.setdefault("deleted", {})
+                data.setdefault("version", 0)
+            self._data = data
+            self._stamp = stamp
+            self._next_check = time.monotonic() + self.check_interval
+
+    def refresh(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        if self._file_stamp() != self._stamp:
+            self.load()
+
+    def get(self, vid):
+        self.refresh()
+        return self._data["videos"].get(vid)
+
+    @property
+    def version(self):
+        self.refresh()
+        return self._data["version"]
+
+    def upsert(self, vid, info):
+        return self.apply({vid: info}, [])
+
+    def apply(self, upserts, deletes):
+        # 여러 건의 추가/수정/삭제를 한 번의 쓰기로 반영하고 새 version 을 반환
+        self.refresh()
+        with self._lock:
+            videos = self._data["videos"]
+            deleted = self._data["deleted"]
+            version = self._data["version"] + 1
+            for vid, info in upserts.items():
+                videos[vid] = dict(info, version=version)
+                deleted.pop(vid, None)
+            for vid in deletes:
+                videos.pop(vid, None)
+                deleted[vid] = version
+            self._data["version"] = version
+            self._save()
+            return version
+
+    def changes_since(self, since):
+        self.refresh()
+        data = self._data
+        # 서버 쪽 카탈로그가 초기화돼서 since 가 더 크면 전체를 돌려줌
+        full = since > data["version"]
+        if full:
+            since = 0
+        return {
+            "version": data["version"],
+            "full": full,
+            "upserts": {vid: info for vid, info in data["videos"].items() if info.get("version", 0) > since},
+            "deletes": [vid for vid, ver in data["deleted"].items() if ver > since],
+        }
+
+    def _save(self):
+        # 임시 파일에 쓴 뒤 교체 → 읽는 쪽이 반쯤 쓰인 파일을 보지 않음
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._data, f)
+        os.replace(tmp_path, self.path)
+        self._stamp = self._file_stamp()